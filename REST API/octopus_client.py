@@ -0,0 +1,359 @@
+import codecs
+import hashlib
+import json
+import os
+import re
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from urllib3.util.retry import Retry
+
+"""
+    Shared Octopus Deploy client used by retrieve-octo-servers.py and
+    compare/compare-lists.py: one pooled session with timeouts and retries,
+    and the machine inventory kept as compact Machine tuples, cached on disk
+    for `ttl` seconds so repeated runs make no API calls. Past the TTL the
+    cached inventory is brought up to date from the events feed (machine
+    created / modified / deleted / health changed since the last seen
+    event) instead of downloading every machine again; an API key that
+    can't read events still works, it just always downloads in full.
+    A full download can read /api/machines/all in one response ('all'),
+    page through /api/machines concurrently ('paged'), or stream
+    /api/machines/all through an incremental parser ('stream') so memory
+    stays flat however large the fleet.
+"""
+
+#Octopus URL
+OCTOPUS_URL = 'https://example.octopus.com'
+# Health states that exclude a deployment target
+UNHEALTHY_STATUSES = ('Unhealthy', 'Unavailable')
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'octopus')
+# Event categories that can change a machine's name, health, disabled flag or environments.
+# The server's own list (/api/events/categories) is preferred: every 'Machine*' category it has, plus the generic ones
+DOCUMENT_EVENT_CATEGORIES = ('Created', 'Modified', 'Deleted')
+MACHINE_EVENT_CATEGORIES = DOCUMENT_EVENT_CATEGORIES + ('MachineHealthy', 'MachineUnhealthy', 'MachineHasWarnings', 'MachineUnavailable', 'MachineAvailable', 'MachineEnabled', 'MachineDisabled')
+EVENTS_PAGE_SIZE = 100
+# Event ids ('Events-1234') grow with every event, so a checkpoint can be found in any filtered view of the feed
+EVENT_NUMBER = re.compile(r'(\d+)$')
+FETCH_MODES = ('all', 'paged', 'stream')
+# whitespace and separators between array items
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+
+class Machine(NamedTuple):
+    id: str
+    name: str
+    health_status: str
+    is_disabled: bool
+    environments: Tuple[str, ...]
+
+    # Includes healthy & healthy with warnings servers only
+    @property
+    def is_healthy(self) -> bool:
+        return not (self.is_disabled or self.health_status in UNHEALTHY_STATUSES)
+
+
+class OctopusClient:
+    def __init__(self, api_key: str, octopus_url: str = OCTOPUS_URL, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, ttl: float = 300, timeout: float = 30, pool_size: int = 4, max_retries: int = 3, max_event_pages: int = 20, full_refresh_after: float = 86400, fetch_mode: str = 'all', page_size: int = 500, page_workers: int = 4):
+        self.octopus_url = octopus_url.rstrip('/')
+        self.timeout = timeout
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        # beyond this many pages of events (or this checkpoint age) a full download is cheaper / safer
+        self.max_event_pages = max_event_pages
+        self.full_refresh_after = full_refresh_after
+        # how a full download reads the machine list: see FETCH_MODES
+        self.fetch_mode = fetch_mode
+        self.page_size = page_size
+        self.page_workers = page_workers
+
+        # Headers for authentication
+        self.session = requests.Session()
+        self.session.headers.update({'X-Octopus-ApiKey': api_key})
+        retry = Retry(total=max_retries, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=max(pool_size, page_workers), max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # one cache file per instance and key, so different credentials never share an inventory
+        cache_key = hashlib.sha256(f"{self.octopus_url}|{api_key}".encode('utf-8')).hexdigest()[:16]
+        self.cache_path = os.path.join(cache_dir, f'machines-{cache_key}.json') if cache_dir else None
+        # machine id -> Machine; environment id -> name
+        self.inventory: Optional[Dict[str, Machine]] = None
+        self.environments: Dict[str, str] = {}
+        # newest machine event applied to the inventory ('' when the feed had none) and when the inventory was built
+        self.event_id: Optional[str] = None
+        # machine event categories known to the server; loaded on first use
+        self.event_categories: Optional[Tuple[str, ...]] = None
+        self.fetched_at = 0.0
+        self.built_at = 0.0
+
+        # counters
+        self.api_calls = 0
+        self.events_applied = 0
+
+    def close(self):
+        self.session.close()
+
+    ### GET an API path and return the decoded JSON; raises requests.HTTPError on failure
+    def get(self, path: str, params: Dict = None):
+        response = self.session.get(f"{self.octopus_url}{path}", params=params, timeout=self.timeout)
+        self.api_calls += 1
+        response.raise_for_status()
+        return response.json()
+
+    ### Every deployment target, from memory, the on-disk cache, the events feed or the API (in that order)
+    def machines(self, refresh: bool = False) -> List[Machine]:
+        if refresh:
+            self.refresh()
+        elif self.inventory is None:
+            self.load_cache()
+            if self.inventory is None:
+                self.refresh()
+            elif time.time() - self.fetched_at > self.ttl:
+                self.update()
+        return list(self.inventory.values())
+
+    def healthy_machines(self, refresh: bool = False) -> List[Machine]:
+        return [machine for machine in self.machines(refresh) if machine.is_healthy]
+
+    def enabled_machines(self, refresh: bool = False) -> List[Machine]:
+        return [machine for machine in self.machines(refresh) if not machine.is_disabled]
+
+    ### Full download of the inventory; the event checkpoint is read first so changes made meanwhile are replayed
+    def refresh(self):
+        self.event_id = self.latest_event_id()
+        self.environments = self.fetch_environments()
+        self.inventory = {machine.id: machine for machine in self.fetch_machines()}
+        self.fetched_at = self.built_at = time.time()
+        self.save_cache()
+
+    ### Apply machine events since the checkpoint; returns the ids of changed machines, or None after a full refresh
+    def update(self) -> Optional[Set[str]]:
+        if self.inventory is None:
+            self.load_cache()
+        if self.inventory is None or self.event_id is None or time.time() - self.built_at > self.full_refresh_after:
+            self.refresh()
+            return None
+
+        try:
+            events = self.events_since(self.event_id)
+        except requests.RequestException as e:
+            print(f"Could not read the events feed, downloading every machine: {e}")
+            events = None
+        if events is None:
+            # checkpoint fell out of the feed (retention) or too far behind
+            self.refresh()
+            return None
+
+        # the last event per machine decides whether it was deleted; the feed is newest first
+        deleted = {}
+        for event in reversed(events):
+            for document_id in event.get('RelatedDocumentIds') or ():
+                if document_id.startswith('Machines-'):
+                    deleted[document_id] = event.get('Category') == 'Deleted'
+
+        for machine_id, was_deleted in deleted.items():
+            server = None if was_deleted else self.fetch_machine(machine_id)
+            if server is None:
+                self.inventory.pop(machine_id, None)
+                continue
+            if any(environment_id not in self.environments for environment_id in server.get('EnvironmentIds') or ()):
+                self.environments = self.fetch_environments()
+            self.inventory[machine_id] = self.to_machine(server, self.environments)
+
+        if events:
+            self.event_id = events[0]['Id']
+        self.events_applied += len(events)
+        self.fetched_at = time.time()
+        self.save_cache()
+        return set(deleted)
+
+    ### Every machine, converted as it is read so raw responses don't pile up
+    def fetch_machines(self) -> Iterator[Machine]:
+        if self.fetch_mode == 'paged':
+            servers = self.fetch_machine_pages()
+        elif self.fetch_mode == 'stream':
+            servers = self.stream('/api/machines/all')
+        else:
+            servers = self.get('/api/machines/all')
+        for server in servers:
+            yield self.to_machine(server, self.environments)
+
+    ### /api/machines?skip=&take= pages; the first page gives the total, the rest are requested concurrently
+    def fetch_machine_pages(self) -> Iterator[Dict]:
+        first = self.get('/api/machines', params={'skip': 0, 'take': self.page_size})
+        yield from first['Items']
+        total = first.get('TotalResults', len(first['Items']))
+
+        skips = range(self.page_size, total, self.page_size)
+        if not skips:
+            return
+        with ThreadPoolExecutor(max_workers=max(1, min(self.page_workers, len(skips)))) as pool:
+            pages = [pool.submit(self.get, '/api/machines', {'skip': skip, 'take': self.page_size}) for skip in skips]
+            # yielded in page order as each page arrives
+            for page in pages:
+                yield from page.result()['Items']
+
+    ### Items of a JSON array response, decoded one at a time from the response stream
+    def stream(self, path: str, params: Dict = None) -> Iterator[Dict]:
+        with self.session.get(f"{self.octopus_url}{path}", params=params, timeout=self.timeout, stream=True) as response:
+            self.api_calls += 1
+            response.raise_for_status()
+            yield from iter_json_array(response.iter_content(chunk_size=64 * 1024))
+
+    ### Newest machine event, any category ('' for an empty feed); None if the feed can't be read, so update() downloads in full
+    def latest_event_id(self) -> Optional[str]:
+        try:
+            latest = self.get('/api/events', params={'documentTypes': 'Machines', 'skip': 0, 'take': 1})['Items']
+            return latest[0]['Id'] if latest else ''
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            print(f"Could not read the events feed checkpoint, the next update will download every machine: {e}")
+            return None
+
+    def event_params(self, skip: int, take: int) -> Dict:
+        return {'eventCategories': ','.join(self.machine_event_categories()), 'documentTypes': 'Machines', 'skip': skip, 'take': take}
+
+    ### Machine-related categories from /api/events/categories; MACHINE_EVENT_CATEGORIES if the list can't be read
+    def machine_event_categories(self) -> Tuple[str, ...]:
+        if self.event_categories is None:
+            try:
+                categories = [category['Id'] for category in self.get('/api/events/categories')]
+            except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+                print(f"Could not read event categories, using the built-in list: {e}")
+                categories = []
+            selected = tuple(category for category in categories if category in DOCUMENT_EVENT_CATEGORIES or category.startswith('Machine'))
+            self.event_categories = selected or MACHINE_EVENT_CATEGORIES
+        return self.event_categories
+
+    ### Machine events newer than event_id, newest first; None if event_id isn't reached within max_event_pages
+    def events_since(self, event_id: str) -> Optional[List[Dict]]:
+        # the checkpoint may be of a category the filtered feed leaves out, so stop at the first event not newer than it
+        checkpoint = event_number(event_id)
+        events = []
+        for page in range(self.max_event_pages):
+            items = self.get('/api/events', params=self.event_params(page * EVENTS_PAGE_SIZE, EVENTS_PAGE_SIZE))['Items']
+            for event in items:
+                number = event_number(event['Id'])
+                if event['Id'] == event_id or (checkpoint is not None and number is not None and number <= checkpoint):
+                    return events
+                events.append(event)
+            if len(items) < EVENTS_PAGE_SIZE:
+                # end of the feed: fine if there was no checkpoint event to find
+                return events if event_id == '' else None
+        return None
+
+    def fetch_machine(self, machine_id: str) -> Optional[Dict]:
+        try:
+            return self.get(f'/api/machines/{machine_id}')
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+    def fetch_environments(self) -> Dict[str, str]:
+        return {environment['Id']: environment['Name'] for environment in self.get('/api/environments/all')}
+
+    ### Keep only the fields the scripts use; environment names are shared between machines
+    @staticmethod
+    def to_machine(server: Dict, environments: Dict[str, str]) -> Machine:
+        return Machine(
+            server['Id'],
+            server['Name'],
+            server.get('HealthStatus') or '',
+            bool(server.get('IsDisabled')),
+            tuple(environments.get(environment_id, environment_id) for environment_id in server.get('EnvironmentIds') or ())
+        )
+
+    def load_cache(self):
+        if not self.cache_path:
+            return
+        # intern environment names so thousands of machines share a handful of strings
+        names = {}
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                cached = json.load(f)
+            inventory = {
+                machine_id: Machine(machine_id, name, health_status, is_disabled, tuple(names.setdefault(environment, environment) for environment in environments))
+                for machine_id, name, health_status, is_disabled, environments in cached['machines']
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            # unreadable or incomplete cache file: treated as no cache
+            return
+
+        self.environments = cached.get('environments') or {}
+        self.event_id = cached.get('event_id')
+        self.fetched_at = cached.get('fetched_at', 0)
+        self.built_at = cached.get('built_at', 0)
+        self.inventory = inventory
+
+    ### Written to a temp file and renamed, so a concurrent run never reads a partial cache
+    def save_cache(self):
+        if not self.cache_path:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cached = {
+            'fetched_at': self.fetched_at,
+            'built_at': self.built_at,
+            'event_id': self.event_id,
+            'environments': self.environments,
+            'machines': [list(machine) for machine in self.inventory.values()]
+        }
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cached, f, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+
+
+def event_number(event_id: str) -> Optional[int]:
+    match = EVENT_NUMBER.search(event_id or '')
+    return int(match.group(1)) if match else None
+
+
+### Incremental parser for a top-level JSON array of objects: yields each item as soon as it is complete,
+### holding at most one item plus one chunk in memory
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator:
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+
+    def read_more() -> bool:
+        nonlocal buffer, pos
+        for chunk in chunks:
+            if chunk:
+                buffer = buffer[pos:] + text.decode(chunk)
+                pos = 0
+                return True
+        return False
+
+    # opening bracket
+    while True:
+        pos = JSON_SEPARATORS.match(buffer, pos).end()
+        if pos < len(buffer):
+            break
+        if not read_more():
+            raise ValueError('Empty JSON response')
+    if buffer[pos] != '[':
+        raise ValueError('Expected a JSON array')
+    pos += 1
+
+    while True:
+        pos = JSON_SEPARATORS.match(buffer, pos).end()
+        if pos == len(buffer):
+            if not read_more():
+                raise ValueError('Unterminated JSON array')
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            item, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # item split across chunks; malformed JSON still raises once the stream is exhausted
+            if not read_more():
+                raise
+            continue
+        yield item
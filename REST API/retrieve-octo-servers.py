@@ -1,44 +1,75 @@
 import requests
 import argparse
+import time
+from octopus_client import DEFAULT_CACHE_DIR, FETCH_MODES, OctopusClient
 
 """
     This script compiles deployment targets that are in Healthy & Healthy with warnings states only
     To run this script, use the following command:
         'python retrieve-octo-servers.py --apikey= XXXXXXXXX'
+    Watch mode keeps the healthy list current from the Octopus events feed, printing changes:
+        'python retrieve-octo-servers.py --apikey= XXXXXXXXX --watch 60'
 """
 
-def get_octopus_machines(api_key):
-    #Octopus URL
-    octopus_url = 'https://example.octopus.com'
-
-    # Octopus API endpoint to get all machines
-    endpoint = f'{octopus_url}/api/machines/all'
-
-    # Headers for authentication
-    headers = {
-        'X-Octopus-ApiKey': api_key
-    }
-
-    # Make the GET request
-    response = requests.get(endpoint, headers=headers)
-
-    # Check if the GET request was successful
-    if response.status_code == 200:
-        servers = response.json()
-        exclude_status = ['Unhealthy', 'Unavailable']
-        server_count = 0
-        for server in servers:
-            # Includes healthy & healthy with warnings servers only            
-            if not (server['IsDisabled'] or server['HealthStatus'] in exclude_status):
-                print((server['Name']))
-                server_count += 1                
-        print(f'Healthy Server Count: {server_count}')
-    else:
-        print(f"Failed to retrieve servers list: {response.status_code}")
+def get_octopus_machines(api_key, cache_dir=DEFAULT_CACHE_DIR, cache_ttl=300, refresh=False, fetch_mode='all', page_size=500):
+    client = OctopusClient(api_key, cache_dir=cache_dir, ttl=cache_ttl, fetch_mode=fetch_mode, page_size=page_size)
+    try:
+        # Includes healthy & healthy with warnings servers only
+        servers = client.healthy_machines(refresh)
+    except requests.RequestException as e:
+        print(f"Failed to retrieve servers list: {e}")
+        return
+    finally:
+        client.close()
+
+    for server in servers:
+        print(server.name)
+    print(f'Healthy Server Count: {len(servers)}')
+
+### Build the inventory once, then poll machine events and print targets entering/leaving the healthy set
+def watch_octopus_machines(api_key, interval, cache_dir=DEFAULT_CACHE_DIR, fetch_mode='all', page_size=500):
+    # ttl=0: every poll checks the events feed
+    client = OctopusClient(api_key, cache_dir=cache_dir, ttl=0, fetch_mode=fetch_mode, page_size=page_size)
+    try:
+        healthy = {server.name for server in client.healthy_machines()}
+        for name in sorted(healthy):
+            print(name)
+        print(f'Healthy Server Count: {len(healthy)}')
+
+        while True:
+            time.sleep(interval)
+            try:
+                changed = client.update()
+            except requests.RequestException as e:
+                print(f"Failed to update servers list: {e}")
+                continue
+
+            current = {server.name for server in client.healthy_machines()}
+            for name in sorted(current - healthy):
+                print(f'+ {name}')
+            for name in sorted(healthy - current):
+                print(f'- {name}')
+            if current != healthy or changed is None:
+                source = 'full refresh' if changed is None else f'{len(changed)} changed machine(s)'
+                print(f'Healthy Server Count: {len(current)} ({source}, {client.api_calls} API call(s) so far)')
+            healthy = current
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Get Octopus deployment targets')
     parser.add_argument('--apikey', required=True, help='Octopus API token')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='directory for the cached machine inventory')
+    parser.add_argument('--cache-ttl', type=float, default=300, help='seconds a cached inventory is reused before it is updated from the events feed')
+    parser.add_argument('--refresh', action='store_true', help='ignore the cached inventory and fetch it again')
+    parser.add_argument('--fetch', choices=FETCH_MODES, default='all', help='full download: one /api/machines/all response, concurrent /api/machines pages, or a streamed parse of /api/machines/all')
+    parser.add_argument('--page-size', type=int, default=500, help='with --fetch paged: machines per page')
+    parser.add_argument('--watch', type=float, metavar='SECONDS', help='keep running, applying machine events every SECONDS')
     args = parser.parse_args()
 
-    get_octopus_machines(args.apikey)
+    if args.watch:
+        watch_octopus_machines(args.apikey, args.watch, args.cache_dir, args.fetch, args.page_size)
+    else:
+        get_octopus_machines(args.apikey, args.cache_dir, args.cache_ttl, args.refresh, args.fetch, args.page_size)
@@ -1,95 +1,71 @@
-from openpyxl import load_workbook
 import requests
 import argparse
+import os
+import sys
+from functools import partial
+from server_inventory import build_index
+
+# the shared Octopus client lives next to retrieve-octo-servers.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'REST API'))
+from octopus_client import DEFAULT_CACHE_DIR, FETCH_MODES, OctopusClient
 
 """
-  This script is used to compare two lists of servers:
-  List 1 (octo_list): Interfacing with Octopus REST API to harvest list of deployment targets (servers) in Cctopus Deploy
-  List 2 (external_list): Excel file containing a list of servers to be compared with the Octopus list
-  The script will return the intersection of the two lists, i.e., the servers that are present in both lists.
-  The script uses the openpyxl library to read the Excel file and the requests library to make API calls.
+  This script is used to compare any number of server lists (inventories):
+  - Octopus: interfacing with Octopus REST API to harvest list of deployment targets (servers) in Octopus Deploy
+  - Excel (.xlsx) files: server names in column A of the active sheet
+  - CSV files: server names in the first column
+  - Plain text files: one server name per line
+  Pick another sheet/column per file with path?sheet=NAME&column=LETTER|NUMBER|HEADER (&header=1 skips a header row)
+  All lists are loaded concurrently (files are streamed) and normalized once into a shared index; short names
+  match the FQDN that shares them (web01 == web01.corp.example.com) unless --exact-names is given. The script prints, per list,
+  how many servers are in every list and only in that list, and can write the membership matrix
+  (for each server, which lists contain it) as CSV, plus intersections, differences and only-in-X sets as JSON.
   To run the script, execute the following command:
-      python compare-lists.py --apikey XXXXXXXXXX
+      python compare-lists.py --apikey XXXXXXXXXX --sources octopus ./servers-list-01.xlsx "cmdb=./export.csv?column=Hostname" --csv matrix.csv --json report.json
 """
 
-def compare_server_lists(external_list, octo_list):
-   
-    external_servers = []
-    try:
-        # Load the Excel workbook
-        workbook = load_workbook(external_list)
-        # Get the active spreadsheet
-        sheet = workbook.active
-        
-        # Reading server names in column A, starting from row 1
-        for row in sheet.iter_rows(min_row=1, min_col=1, max_col=1):
-            server_name = row[0].value
-            if server_name:  # Check if cell is not empty
-                external_servers.append(str(server_name).strip().lower())
-                
-    except Exception as e:
-        print(f"Error reading Excel file: {e}")
-        return None        
-
-    # Convert to sets for efficient comparison
-    external_servers_set = set(external_servers)
-    octo_servers_set = set(octo_list)
-
-    # Perform Comparisons to find servers in both lists (intersection)
-    results = (list(octo_servers_set.intersection(external_servers_set)))
-    return results
-
 ### Using Octopus REST API to harvest deployment targets (aka servers)
-def get_octopus_servers(api_key):
-    #Octopus URL
-    octopus_url = 'https://example.octopus.com'
-
-    # Octopus API endpoint to get all servers
-    endpoint = f'{octopus_url}/api/machines/all'
-
-    # Headers for authentication
-    headers = {
-        'X-Octopus-ApiKey': api_key
-    }
-
-    # Create empty Array/List to store server names
-    server_names = []
-
-    # Make the GET request
-    response = requests.get(endpoint, headers=headers)
-
-    # Check if the request was successful
-    if response.status_code == 200:
-        servers = response.json()
-        for server in servers:
-            # Includes all enabled servers only            
-            if not (server['IsDisabled']):
-                server_names.append((server['Name']).lower())
-        return server_names                           
-        
-    else:
-        print(f"Failed to retrieve servers: {response.status_code}")
-        return []
+def get_octopus_servers(api_key, cache_dir=DEFAULT_CACHE_DIR, cache_ttl=300, refresh=False, fetch_mode='all', page_size=500):
+    client = OctopusClient(api_key, cache_dir=cache_dir, ttl=cache_ttl, fetch_mode=fetch_mode, page_size=page_size)
+    try:
+        # Includes all enabled servers only
+        return [server.name.lower() for server in client.enabled_machines(refresh)]
+    finally:
+        client.close()
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='Get Octopus servers list')
-    parser.add_argument('--apikey', required=True, help='Octopus API token')
+    parser = argparse.ArgumentParser(description='Compare server lists')
+    parser.add_argument('--sources', nargs='+', required=True, help="lists to compare: 'octopus', or .xlsx / .csv / text file paths, optionally as label=path and with ?sheet=..&column=..&header=1")
+    parser.add_argument('--apikey', help='Octopus API token (required with the octopus source)')
+    parser.add_argument('--exact-names', action='store_true', help='compare normalized names exactly, without matching short names to FQDNs')
+    parser.add_argument('--csv', help='write the membership matrix to this CSV file')
+    parser.add_argument('--json', help='write counts, intersection, differences, only-in sets and the matrix to this JSON file')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='directory for the cached machine inventory')
+    parser.add_argument('--cache-ttl', type=float, default=300, help='seconds a cached inventory is reused before it is updated from the events feed')
+    parser.add_argument('--refresh', action='store_true', help='ignore the cached inventory and fetch it again')
+    parser.add_argument('--fetch', choices=FETCH_MODES, default='all', help='full download: one /api/machines/all response, concurrent /api/machines pages, or a streamed parse of /api/machines/all')
+    parser.add_argument('--page-size', type=int, default=500, help='with --fetch paged: machines per page')
     args = parser.parse_args()
-        
-    #Path to  server list 1
-    listOne = './<path-to>/servers-list-01.xlsx'
 
-    #Path to server list 2
-    listTwo = './<path-to>/servers-list-02.xlsx'
+    octopus_servers = None
+    if args.apikey:
+        octopus_servers = partial(get_octopus_servers, args.apikey, args.cache_dir, args.cache_ttl, args.refresh, args.fetch, args.page_size)
+
+    try:
+        index = build_index(args.sources, octopus_servers, match_fqdn=not args.exact_names)
+    except (requests.RequestException, OSError, ValueError) as e:
+        print(f"Failed to load server lists: {e}")
+        sys.exit(1)
 
-    # You can add a 3rd or more lists to compare
-  
-    #Compile Octopus Server List
-    octopus_server_list = get_octopus_servers(args.apikey)
+    counts = index.counts()
+    intersection = index.intersection()
+    print(f"{len(index.membership)} distinct server(s) across {len(index.sources)} list(s); {len(intersection)} in every list")
+    for i, source in enumerate(index.sources):
+        print(f"  {source}: {counts[source]} server(s), {len(index.only_in(i))} only in this list")
 
-    # use compare_server_lists function to compare the lists
-    listOneIntersection = compare_server_lists(listOne, octopus_server_list)
-    listTwoIntersection = compare_server_lists(listTwo, octopus_server_list)
-    
-    print(f"\nServers list #1 comparison: {listOneIntersection}")
-    print(f"\nServers list #2 comparison: {listTwoIntersection}")
+    if args.csv:
+        index.write_csv(args.csv)
+    if args.json:
+        index.write_json(args.json)
+    if not (args.csv or args.json):
+        print(f"\nServers in every list: {intersection}")
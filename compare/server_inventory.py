@@ -0,0 +1,233 @@
+import csv
+import json
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import permutations
+from openpyxl import load_workbook
+from openpyxl.utils import column_index_from_string
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl
+
+"""
+    N-way comparison of server inventories. Every source (spreadsheet, CSV,
+    plain-text list, Octopus) is loaded concurrently and its names are
+    normalized once into a shared index of name -> membership bitmask, from
+    which the membership matrix, intersection, pairwise differences and
+    only-in-X sets are read.
+    Files are streamed: spreadsheets through openpyxl's read-only mode and
+    CSV / text files line by line, so large CMDB exports never sit in
+    memory as a whole. A sheet and column can be picked per source with
+    'path?sheet=Servers&column=Hostname' (column: A-Z, 1-based number or
+    header name; header=1 skips the first row for letters and numbers).
+    Short names are matched to the FQDN that shares them through a
+    precomputed index.
+"""
+
+OCTOPUS_SOURCE = 'octopus'
+COLUMN_LETTERS = re.compile(r'[A-Za-z]{1,3}')
+IPV4_ADDRESS = re.compile(r'\d{1,3}(\.\d{1,3}){3}')
+
+
+# Ensure one spelling per server | strip, lowercase & drop the root dot of an FQDN
+def normalize(name) -> str:
+    return str(name).strip().lower().rstrip('.')
+
+
+def normalize_names(names: Iterable) -> Iterator[str]:
+    for name in names:
+        if name is not None:
+            name = normalize(name)
+            if name:
+                yield name
+
+
+### Column selector -> (0-based index, skip the first row); header names are resolved against the first row
+def column_index(column: Optional[str], header: Optional[List], has_header: bool = False) -> Tuple[int, bool]:
+    if not column:
+        return 0, has_header
+    if column.isdigit():
+        return int(column) - 1, has_header
+    if header is not None:
+        names = [normalize(cell) if cell is not None else '' for cell in header]
+        if normalize(column) in names:
+            return names.index(normalize(column)), True
+    # next to a header row only a single letter counts as a column, so a mistyped name like 'IP' isn't read as column IP
+    if COLUMN_LETTERS.fullmatch(column) and (header is None or len(column) == 1):
+        return column_index_from_string(column.upper()) - 1, has_header
+    raise ValueError(f"Column {column!r} not found in header {header}; use its 1-based number for columns past Z")
+
+
+### Server names in one column of a worksheet (default: column A of the active sheet), streamed in read-only mode
+def read_xlsx(path: str, sheet: Optional[str] = None, column: Optional[str] = None, header: bool = False) -> Iterator:
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet and sheet not in workbook.sheetnames:
+            raise ValueError(f"Sheet {sheet!r} not found in {path}; available: {workbook.sheetnames}")
+        worksheet = workbook[sheet] if sheet else workbook.active
+        rows = worksheet.iter_rows(values_only=True)
+        first = next(rows, None)
+        index, skip_first = column_index(column, first, header)
+        if first is not None and not skip_first and index < len(first):
+            yield first[index]
+        for row in rows:
+            if index < len(row):
+                yield row[index]
+    finally:
+        # read-only workbooks keep the file open until closed
+        workbook.close()
+
+
+### Server names in one column of a CSV file (default: the first)
+def read_csv(path: str, sheet: Optional[str] = None, column: Optional[str] = None, header: bool = False) -> Iterator:
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        rows = csv.reader(f)
+        first = next(rows, None)
+        index, skip_first = column_index(column, first, header)
+        if first is not None and not skip_first and index < len(first):
+            yield first[index]
+        for row in rows:
+            if index < len(row):
+                yield row[index]
+
+
+### One server name per line; '#' comments are skipped
+def read_text(path: str, sheet: Optional[str] = None, column: Optional[str] = None, header: bool = False) -> Iterator[str]:
+    with open(path, encoding='utf-8-sig') as f:
+        for line in f:
+            if not line.lstrip().startswith('#'):
+                yield line
+
+
+READERS = {'.xlsx': read_xlsx, '.xlsm': read_xlsx, '.csv': read_csv}
+
+
+### 'label=path?sheet=..&column=..&header=1' or a bare path / 'octopus'; the label defaults to the file name and never contains a path separator
+def parse_source(spec: str) -> Tuple[str, str, Dict[str, str]]:
+    label, sep, location = spec.partition('=')
+    # 'exports/date=2024-10-01/servers.csv' is a path: labels have no path separators, and an existing file wins
+    is_path = any(separator in label for separator in ('/', os.sep, os.altsep) if separator) or os.path.exists(spec.partition('?')[0])
+    if not sep or '?' in label or is_path:
+        label, location = '', spec
+    location, _, query = location.partition('?')
+    options = dict(parse_qsl(query))
+    unknown = set(options) - {'sheet', 'column', 'header'}
+    if unknown:
+        raise ValueError(f"Unknown source option(s) {sorted(unknown)} in {spec!r}")
+    if 'header' in options:
+        options['header'] = options['header'].lower() in ('1', 'true', 'yes')
+    if 'sheet' in options and READERS.get(os.path.splitext(location)[1].lower()) is not read_xlsx:
+        raise ValueError(f"Option 'sheet' only applies to spreadsheets, not {location!r}")
+    if not label:
+        label = OCTOPUS_SOURCE if location == OCTOPUS_SOURCE else os.path.basename(location)
+    return label, location, options
+
+
+class HostnameIndex:
+    """
+    Short host name -> FQDNs seen in any source. A bare short name resolves
+    to the FQDN that shares it when exactly one does, so 'web01' and
+    'web01.corp.example.com' count as one server; ambiguous short names and
+    IP addresses are left as they are.
+    """
+    def __init__(self, names: Iterable[str]):
+        self.fqdns = defaultdict(set)
+        for name in names:
+            if '.' in name and not IPV4_ADDRESS.fullmatch(name):
+                self.fqdns[name.split('.', 1)[0]].add(name)
+        # precomputed: only unambiguous short names are rewritten
+        self.resolved = {short: next(iter(fqdns)) for short, fqdns in self.fqdns.items() if len(fqdns) == 1}
+
+    def resolve(self, name: str) -> str:
+        return self.resolved.get(name, name)
+
+
+class ServerIndex:
+    """
+    Normalized server name -> bitmask of the sources listing it (bit i for
+    sources[i]). Set operations are a single pass over the index.
+    """
+    def __init__(self, sources: List[str]):
+        self.sources = sources
+        self.membership: Dict[str, int] = {}
+
+    def add(self, source: int, names: Iterable[str]):
+        bit = 1 << source
+        membership = self.membership
+        for name in names:
+            membership[name] = membership.get(name, 0) | bit
+
+    def select(self, include: int, exclude: int = 0) -> List[str]:
+        return sorted(name for name, mask in self.membership.items() if mask & include == include and not mask & exclude)
+
+    def counts(self) -> Dict[str, int]:
+        return {source: sum(1 for mask in self.membership.values() if mask >> i & 1) for i, source in enumerate(self.sources)}
+
+    # Servers present in every source
+    def intersection(self) -> List[str]:
+        return self.select((1 << len(self.sources)) - 1)
+
+    # Servers in source a but not in source b
+    def difference(self, a: int, b: int) -> List[str]:
+        return self.select(1 << a, 1 << b)
+
+    # Servers listed by this source alone
+    def only_in(self, source: int) -> List[str]:
+        all_sources = (1 << len(self.sources)) - 1
+        return self.select(1 << source, all_sources & ~(1 << source))
+
+    ### One row per server: name, then 1/0 per source
+    def matrix(self) -> Iterator[List]:
+        for name in sorted(self.membership):
+            mask = self.membership[name]
+            yield [name] + [mask >> i & 1 for i in range(len(self.sources))]
+
+    def report(self) -> Dict:
+        return {
+            'sources': self.sources,
+            'counts': self.counts(),
+            'intersection': self.intersection(),
+            'only_in': {source: self.only_in(i) for i, source in enumerate(self.sources)},
+            'differences': {f"{self.sources[a]} - {self.sources[b]}": self.difference(a, b) for a, b in permutations(range(len(self.sources)), 2)},
+            'matrix': {name: [source for i, source in enumerate(self.sources) if mask >> i & 1] for name, mask in sorted(self.membership.items())}
+        }
+
+    def write_csv(self, path: str):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['server'] + self.sources)
+            writer.writerows(self.matrix())
+
+    def write_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+### Load every source concurrently and index the normalized names in source order
+def build_index(specs: List[str], octopus_servers: Optional[Callable[[], List[str]]] = None, workers: int = 4, match_fqdn: bool = True) -> ServerIndex:
+
+    sources = [parse_source(spec) for spec in specs]
+    labels = [label for label, _, _ in sources]
+    if len(set(labels)) != len(labels):
+        raise ValueError(f"Duplicate source labels: {labels}; use label=path to tell them apart")
+
+    def load(location: str, options: Dict[str, str]) -> Set[str]:
+        if location == OCTOPUS_SOURCE:
+            if octopus_servers is None:
+                raise ValueError('An Octopus source needs an API key')
+            names = octopus_servers()
+        else:
+            reader = READERS.get(os.path.splitext(location)[1].lower(), read_text)
+            names = reader(location, **options)
+        return set(normalize_names(names))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources)))) as pool:
+        loaded = [pool.submit(load, location, options) for _, location, options in sources]
+        names = [future.result() for future in loaded]
+
+    hostnames = HostnameIndex(name for source_names in names for name in source_names) if match_fqdn else None
+    index = ServerIndex(labels)
+    for i, source_names in enumerate(names):
+        index.add(i, map(hostnames.resolve, source_names) if hostnames else source_names)
+    return index
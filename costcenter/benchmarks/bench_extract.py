@@ -0,0 +1,130 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import yaml
+from typing import List, Optional
+
+# make the costcenter modules importable when run from any directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extractors import SafeLoader, extract_expense_ids, extract_prod_owner_ids
+
+"""
+    Micro-benchmark of expense-ID extraction over a synthetic corpus of
+    costcenter.yaml / prod-owner.md files, comparing the original
+    per-file implementation with the extractors engine.
+    To run this script, use the following command:
+        'python benchmarks/bench_extract.py --files 5000'
+"""
+
+
+### Original implementation of ScanRepo.get_expense_id, kept as the baseline
+def legacy_expense_id(content: str):
+    if not content:
+        return []
+    try:
+        yaml_content = yaml.safe_load(content)
+        expense_ids = []
+        if isinstance(yaml_content, dict):
+            exp_id_keys = ['exp-id', 'expid', 'EXP-ID']
+            for key in exp_id_keys:
+                if key in yaml_content:
+                    return str(yaml_content[key])
+
+            def search_exp_id(data):
+                results = []
+                if isinstance(data, dict):
+                    for key, value in data.items():
+                        if key.lower() in [k.lower() for k in exp_id_keys]:
+                            results.append(str(value))
+                        if isinstance(value, (dict, list)):
+                            results.extend(search_exp_id(value))
+                elif isinstance(data, list):
+                    for item in data:
+                        results.extend(search_exp_id(item))
+                return results
+
+            expense_ids = search_exp_id(yaml_content)
+        return expense_ids
+    except yaml.YAMLError:
+        return []
+
+
+### Original implementation of ScanRepo.get_prod_owner_exp_id, kept as the baseline
+def legacy_prod_owner_exp_id(content: str):
+    if not content:
+        return []
+    matches = re.findall(r'(?i)CC\d{7}', content)
+    unique_exp_ids = {}
+    for match in matches:
+        if match.lower() not in unique_exp_ids:
+            unique_exp_ids[match.lower()] = match
+    return list(unique_exp_ids.values())
+
+
+### Synthetic costcenter.yaml: nested metadata, with an exp-id in roughly `hit_rate` of the files
+def make_yaml(rng: random.Random, hit_rate: float) -> str:
+    lines = ['service:', f'  name: svc-{rng.randint(0, 99999)}', '  owners:']
+    lines += [f'    - team-{rng.randint(0, 500)}' for _ in range(rng.randint(1, 5))]
+    lines += ['  deploy:', '    regions: [ap-southeast-1, us-east-1]', f'    replicas: {rng.randint(1, 9)}']
+    for i in range(rng.randint(5, 30)):
+        lines.append(f'  label-{i}: value-{rng.randint(0, 10 ** 6)}')
+    if rng.random() < hit_rate:
+        key = rng.choice(['exp-id', 'expid', 'EXP-ID', 'Exp-Id'])
+        lines += ['billing:', f'  {key}: CC{rng.randint(0, 10 ** 7 - 1):07d}']
+    return '\n'.join(lines) + '\n'
+
+
+### Synthetic prod-owner.md with a few expense IDs buried in prose
+def make_markdown(rng: random.Random) -> str:
+    paragraphs = ['# Product ownership', 'Owner: team-' + str(rng.randint(0, 500))]
+    for _ in range(rng.randint(3, 15)):
+        paragraphs.append(' '.join(rng.choice(['service', 'budget', 'on-call', 'escalation', 'cost', 'center']) for _ in range(40)))
+    for _ in range(rng.randint(0, 3)):
+        paragraphs.append(f"Expense: {rng.choice(['CC', 'cc'])}{rng.randint(0, 10 ** 7 - 1):07d}")
+    return '\n\n'.join(paragraphs) + '\n'
+
+
+def timed(extract, corpus: List[str], rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for content in corpus:
+            extract(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def report(label: str, files: int, legacy: float, engine: float):
+    print(f"{label:<16} legacy: {files / legacy:>10,.0f} files/s | engine: {files / engine:>10,.0f} files/s | speed-up: {legacy / engine:.1f}x")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Benchmark expense-ID extraction')
+    parser.add_argument('--files', type=int, default=5000, help='number of files of each type in the corpus')
+    parser.add_argument('--hit-rate', type=float, default=0.3, help='fraction of YAML files that contain an exp-id key')
+    parser.add_argument('--rounds', type=int, default=3, help='timed rounds; the best is reported')
+    parser.add_argument('--seed', type=int, default=42, help='corpus random seed')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    yaml_corpus = [make_yaml(rng, args.hit_rate) for _ in range(args.files)]
+    md_corpus = [make_markdown(rng) for _ in range(args.files)]
+
+    # the engine must agree with the baseline (modulo the old bare-string top-level result)
+    for content in yaml_corpus:
+        legacy = legacy_expense_id(content)
+        assert extract_expense_ids(content) == ([legacy] if isinstance(legacy, str) else legacy)
+    for content in md_corpus:
+        assert extract_prod_owner_ids(content) == legacy_prod_owner_exp_id(content)
+
+    print(f"YAML loader: {SafeLoader.__name__} | corpus: {args.files} YAML + {args.files} MD files")
+    report('costcenter.yaml', args.files, timed(legacy_expense_id, yaml_corpus, args.rounds), timed(extract_expense_ids, yaml_corpus, args.rounds))
+    report('prod-owner.md', args.files, timed(legacy_prod_owner_exp_id, md_corpus, args.rounds), timed(extract_prod_owner_ids, md_corpus, args.rounds))
+
+
+if __name__ == '__main__':
+    main()
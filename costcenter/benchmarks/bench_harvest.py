@@ -0,0 +1,122 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+# make the costcenter modules importable when run from any directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harvest_data
+import upload2Snowflake
+from fake_github import FakeGitHubServer, SyntheticWorld
+from fake_snowflake import SQLiteConnection
+
+"""
+    End-to-end benchmark of harvest_data.main against a local fake GitHub
+    API and a SQLite stand-in for Snowflake, at several org sizes. Reports
+    wall time, GitHub requests per endpoint type and rows written, so
+    changes to ScanRepo or update_snowflake can be compared offline.
+    Options not listed below are passed through to harvest_data.py.
+    To run this script, use the following command:
+        'python benchmarks/bench_harvest.py --scales 50 200 1000 --latency 0.02 --workers 8'
+        'python benchmarks/bench_harvest.py --scales 200 --graphql-batch-size 50'
+        'python benchmarks/bench_harvest.py --scales 200 200 --port 8765 --cache-dir /tmp/bench-cache'
+"""
+
+
+### One harvest_data.main run over a fresh synthetic world; returns the measurements
+def run_scale(args, repos_per_org: int, harvest_args: List[str]) -> Dict:
+
+    world = SyntheticWorld(args.orgs, repos_per_org, files_per_repo=args.files, tree_depth=args.depth, hit_rate=args.hit_rate, seed=args.seed)
+    server = FakeGitHubServer(world, latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit, rate_window=args.rate_window, port=args.port).start()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'snowflake.db')
+        connections = []
+
+        def connect_snowflake() -> SQLiteConnection:
+            connection = SQLiteConnection(db_path)
+            connections.append(connection)
+            return connection
+
+        # point the harvester at the fake services
+        harvest_data.BASE_URL = server.url
+        upload2Snowflake.connect_snowflake = connect_snowflake
+        harvest_data.connect_snowflake = connect_snowflake
+
+        sys.argv = [
+            'harvest_data.py',
+            '--orgs', *world.org_names,
+            '--token', 'benchmark',
+            '--workers', str(args.workers),
+            '--upload-mode', args.upload_mode
+        ] + harvest_args
+
+        output = io.StringIO()
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+                harvest_data.main()
+        finally:
+            elapsed = time.perf_counter() - start
+            server.close()
+
+        with contextlib.closing(SQLiteConnection(db_path)) as connection:
+            rows = connection.conn.execute('SELECT COUNT(*) FROM GITHUB_DATA').fetchone()[0]
+
+    stats = server.stats()
+    return {
+        'repos': args.orgs * repos_per_org,
+        'seconds': elapsed,
+        'requests': stats['requests'],
+        'by_endpoint': stats['by_endpoint'],
+        'bytes_sent': stats['bytes_sent'],
+        'rate_limited': stats['rate_limited'],
+        'not_modified': stats['not_modified'],
+        'connections': len(connections),
+        'statements': sum(connection.statements for connection in connections),
+        'rows': rows
+    }
+
+
+def report(result: Dict):
+    endpoints = ' '.join(f"{name}={count}" for name, count in result['by_endpoint'].items())
+    print(
+        f"{result['repos']:>7,} repos | {result['seconds']:>8.2f}s | {result['repos'] / result['seconds']:>8.1f} repos/s | "
+        f"{result['requests']:>7,} requests ({endpoints}) | {result['bytes_sent'] / 1024:>9,.0f} KiB | "
+        f"{result['rate_limited']} rate-limited, {result['not_modified']} not modified | {result['connections']} connection(s), {result['statements']} SQL statement(s) | {result['rows']:,} rows"
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Benchmark harvest_data.main against a local fake GitHub and Snowflake', epilog='unrecognized options are passed to harvest_data.py')
+    parser.add_argument('--scales', type=int, nargs='+', default=[50, 200, 1000], help='repos per org, one run each')
+    parser.add_argument('--orgs', type=int, default=1, help='number of synthetic orgs')
+    parser.add_argument('--files', type=int, default=40, help='filler files per repo')
+    parser.add_argument('--depth', type=int, default=4, help='maximum directory depth of the filler files')
+    parser.add_argument('--hit-rate', type=float, default=0.3, help='fraction of repos with a costcenter.yaml (half as many get a PROD-OWNER.md)')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds added to every fake GitHub response')
+    parser.add_argument('--jitter', type=float, default=0.01, help='random extra latency of up to this many seconds')
+    parser.add_argument('--rate-limit', type=int, default=0, help='requests per rate-limit window and resource (0: unlimited)')
+    parser.add_argument('--rate-window', type=float, default=60, help='length of the rate-limit window in seconds')
+    parser.add_argument('--workers', type=int, default=8, help='harvest_data.py --workers')
+    parser.add_argument('--upload-mode', choices=['bulk', 'executemany', 'row', 'sync'], default='bulk', help='harvest_data.py --upload-mode')
+    parser.add_argument('--port', type=int, default=0, help='fake GitHub port (0: any free port); fix it to reuse a --cache-dir across runs')
+    parser.add_argument('--seed', type=int, default=42, help='synthetic org random seed')
+    parser.add_argument('--verbose', action='store_true', help='show the output of harvest_data.py')
+    args, harvest_args = parser.parse_known_args(argv)
+
+    # the fake server is local; keep any configured HTTP proxy out of the way
+    os.environ['NO_PROXY'] = ','.join(filter(None, [os.environ.get('NO_PROXY'), '127.0.0.1']))
+
+    print(f"Synthetic orgs: {args.orgs} | files/repo: {args.files} | depth: {args.depth} | latency: {args.latency * 1000:.0f}ms (+{args.jitter * 1000:.0f}ms) | workers: {args.workers} | upload: {args.upload_mode} {' '.join(harvest_args)}")
+    for repos_per_org in args.scales:
+        report(run_scale(args, repos_per_org, harvest_args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+from metrics import endpoint_type
+
+"""
+    Local stand-in for the GitHub REST and GraphQL endpoints used by ScanRepo,
+    serving synthetic orgs generated from a seed: repo listing, git trees,
+    blobs, contents, commits, code search and batched blob queries. Latency
+    and a fixed-window rate limit can be injected; requests, bytes and
+    rate-limited responses are counted per endpoint type. GET responses
+    carry ETag / Last-Modified validators and conditional requests for
+    unchanged content get a 304, so the response cache can be measured.
+"""
+
+FILLER_FILES = ('README.md', 'main.py', 'config.json', 'Dockerfile', 'values.yaml', 'index.ts', 'Makefile')
+FILLER_DIRS = ('src', 'lib', 'docs', 'deploy', 'charts', 'app', 'tests', 'infra')
+PUSHED_AT = '2024-01-01T00:00:00Z'
+# the synthetic world never changes, so every response was last modified when it was pushed
+LAST_MODIFIED = 'Mon, 01 Jan 2024 00:00:00 GMT'
+
+
+### git blob SHA of a text file, as GitHub reports it
+def blob_sha(content: str) -> str:
+    data = content.encode('utf-8')
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+class SyntheticWorld:
+    """
+    Deterministic orgs of `repos_per_org` repos, each with `files_per_repo`
+    filler files up to `tree_depth` directories deep. About `hit_rate` of the
+    repos carry a costcenter.yaml (at a random depth) and half as many a
+    PROD-OWNER.md at the root. Repos are generated on first access.
+    """
+    def __init__(self, orgs: int, repos_per_org: int, files_per_repo: int = 40, tree_depth: int = 4, hit_rate: float = 0.3, seed: int = 42):
+        self.org_names = [f'bench-org-{i}' for i in range(orgs)]
+        self.repos_per_org = repos_per_org
+        self.files_per_repo = files_per_repo
+        self.tree_depth = tree_depth
+        self.hit_rate = hit_rate
+        self.seed = seed
+        self.lock = threading.Lock()
+        # (org, repo) -> {path: content}; sha -> content for every generated blob
+        self.repos = {}
+        self.blobs = {}
+
+    def repo_names(self, org_name: str) -> List[str]:
+        if org_name not in self.org_names:
+            return []
+        return [f'repo-{i:05d}' for i in range(self.repos_per_org)]
+
+    def files(self, org_name: str, repo_name: str) -> Optional[Dict[str, str]]:
+        if repo_name not in self.repo_names(org_name):
+            return None
+        key = (org_name, repo_name)
+        with self.lock:
+            if key in self.repos:
+                return self.repos[key]
+
+        rng = random.Random(f'{self.seed}/{org_name}/{repo_name}')
+        files = {}
+        for i in range(self.files_per_repo):
+            dirs = [rng.choice(FILLER_DIRS) for _ in range(rng.randint(0, self.tree_depth))]
+            name = f'{i}-{rng.choice(FILLER_FILES)}'
+            files['/'.join(dirs + [name])] = f'filler {org_name}/{repo_name} #{i}\n'
+        if rng.random() < self.hit_rate:
+            dirs = [rng.choice(FILLER_DIRS[3:]) for _ in range(rng.randint(0, self.tree_depth))]
+            files['/'.join(dirs + ['costcenter.yaml'])] = f'service:\n  name: {repo_name}\nbilling:\n  exp-id: CC{rng.randint(0, 10 ** 7 - 1):07d}\n'
+        if rng.random() < self.hit_rate / 2:
+            files['PROD-OWNER.md'] = f'# Ownership\n\nExpense: CC{rng.randint(0, 10 ** 7 - 1):07d}\n'
+
+        with self.lock:
+            self.repos[key] = files
+            for content in files.values():
+                self.blobs[blob_sha(content)] = content
+        return files
+
+
+class RateLimit:
+    """Fixed-window budget per resource, reported through X-RateLimit-* headers."""
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        # resource -> [window start, requests used]
+        self.windows = defaultdict(lambda: [0.0, 0])
+
+    def take(self, resource: str) -> Tuple[bool, Dict[str, str]]:
+        if self.limit <= 0:
+            return True, {}
+        with self.lock:
+            now = time.time()
+            window = self.windows[resource]
+            if now >= window[0] + self.window:
+                window[0], window[1] = now, 0
+            allowed = window[1] < self.limit
+            if allowed:
+                window[1] += 1
+            headers = {
+                'X-RateLimit-Limit': str(self.limit),
+                'X-RateLimit-Remaining': str(self.limit - window[1]),
+                'X-RateLimit-Reset': str(math.ceil(window[0] + self.window)),
+                'X-RateLimit-Resource': resource
+            }
+        return allowed, headers
+
+    ### Refund a request; like GitHub, 304 responses don't count against the limit
+    def give_back(self, resource: str):
+        if self.limit <= 0:
+            return
+        with self.lock:
+            window = self.windows[resource]
+            window[1] = max(0, window[1] - 1)
+
+
+class FakeGitHubServer:
+    """
+    Threaded HTTP server for a SyntheticWorld on 127.0.0.1. Every response is
+    delayed by `latency` plus up to `jitter` seconds. Cached URLs include the
+    port, so runs sharing a response cache need a fixed `port` (0: any free).
+    """
+    def __init__(self, world: SyntheticWorld, latency: float = 0.0, jitter: float = 0.0, rate_limit: int = 0, rate_window: float = 60.0, port: int = 0):
+        self.world = world
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = RateLimit(rate_limit, rate_window)
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.bytes_sent = 0
+        self.rate_limited = 0
+        self.not_modified = 0
+
+        handler = type('Handler', (FakeGitHubHandler,), {'fake': self})
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self) -> 'FakeGitHubServer':
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def record(self, path: str, size: int, rate_limited: bool, not_modified: bool = False):
+        with self.lock:
+            self.requests[endpoint_type(path)] += 1
+            self.bytes_sent += size
+            self.rate_limited += rate_limited
+            self.not_modified += not_modified
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                'requests': sum(self.requests.values()),
+                'by_endpoint': dict(sorted(self.requests.items())),
+                'bytes_sent': self.bytes_sent,
+                'rate_limited': self.rate_limited,
+                'not_modified': self.not_modified
+            }
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    fake: FakeGitHubServer = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def handle_request(self, method: str):
+        fake = self.fake
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        body = None
+        if method == 'POST':
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+
+        if fake.latency or fake.jitter:
+            time.sleep(fake.latency + random.uniform(0, fake.jitter))
+
+        resource = 'search' if url.path.startswith('/search/') else 'graphql' if url.path == '/graphql' else 'core'
+        allowed, headers = fake.rate_limit.take(resource)
+        if not allowed:
+            status, payload = 403, {'message': 'API rate limit exceeded (benchmark)'}
+        else:
+            status, payload, extra_headers = self.route(method, url.path, params, body)
+            headers.update(extra_headers)
+
+        if isinstance(payload, str):
+            data = payload.encode('utf-8')
+            headers.setdefault('Content-Type', 'text/plain; charset=utf-8')
+        else:
+            data = json.dumps(payload).encode('utf-8')
+            headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+
+        # validators for successful GETs; a matching conditional request gets an empty 304
+        not_modified = False
+        if method == 'GET' and status == 200:
+            etag = f'"{hashlib.sha1(data).hexdigest()}"'
+            headers.update({'ETag': etag, 'Last-Modified': LAST_MODIFIED})
+            if_none_match = self.headers.get('If-None-Match')
+            if if_none_match == etag or (if_none_match is None and self.headers.get('If-Modified-Since') == LAST_MODIFIED):
+                status, data, not_modified = 304, b'', True
+                fake.rate_limit.give_back(resource)
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        fake.record(url.path, len(data), not allowed, not_modified)
+
+    def route(self, method: str, path: str, params: Dict[str, str], body: Optional[Dict]) -> Tuple[int, object, Dict[str, str]]:
+        world = self.fake.world
+
+        if method == 'POST' and path == '/graphql':
+            return 200, self.graphql(body), {}
+
+        match = re.fullmatch(r'/users/([^/]+)/repos', path)
+        if match:
+            return self.repo_page(match.group(1), int(params.get('page', 1)), int(params.get('per_page', 30)))
+
+        if path == '/search/code':
+            return 200, self.code_search(params.get('q', ''), int(params.get('page', 1)), int(params.get('per_page', 30))), {}
+
+        match = re.fullmatch(r'/repos/([^/]+)/([^/]+)/(git/trees|git/blobs|contents|commits)(?:/(.*))?', path)
+        if not match:
+            return 404, {'message': 'Not Found'}, {}
+        org_name, repo_name, kind, rest = match.group(1), match.group(2), match.group(3), unquote(match.group(4) or '')
+        files = world.files(org_name, repo_name)
+        if files is None:
+            return 404, {'message': 'Not Found'}, {}
+
+        if kind == 'git/trees':
+            tree = [self.blob_entry(org_name, repo_name, path, content) for path, content in sorted(files.items())]
+            return 200, {'sha': blob_sha(repo_name), 'truncated': False, 'tree': tree}, {}
+
+        if kind == 'git/blobs':
+            content = world.blobs.get(rest)
+            if content is None:
+                return 404, {'message': 'Not Found'}, {}
+            return 200, {'sha': rest, 'encoding': 'base64', 'content': base64.b64encode(content.encode('utf-8')).decode('ascii')}, {}
+
+        if kind == 'commits':
+            # every repo sits at one fixed commit, so incremental runs see them unchanged
+            return 200, blob_sha(f'{org_name}/{repo_name}'), {}
+
+        return self.contents(org_name, repo_name, files, rest.strip('/'))
+
+    def base(self) -> str:
+        return self.fake.url
+
+    def blob_entry(self, org_name: str, repo_name: str, path: str, content: str) -> Dict:
+        sha = blob_sha(content)
+        return {'path': path, 'mode': '100644', 'type': 'blob', 'sha': sha, 'size': len(content), 'url': f'{self.base()}/repos/{org_name}/{repo_name}/git/blobs/{sha}'}
+
+    def repo_page(self, org_name: str, page: int, per_page: int) -> Tuple[int, object, Dict[str, str]]:
+        names = self.fake.world.repo_names(org_name)
+        if not names:
+            return 404, {'message': 'Not Found'}, {}
+        repos = [
+            {'name': name, 'html_url': f'https://github.com/{org_name}/{name}', 'default_branch': 'main', 'archived': False, 'pushed_at': PUSHED_AT}
+            for name in names[(page - 1) * per_page:page * per_page]
+        ]
+        last_page = max(1, math.ceil(len(names) / per_page))
+        headers = {}
+        if last_page > 1:
+            link = f'{self.base()}/users/{org_name}/repos?per_page={per_page}&page='
+            links = []
+            if page < last_page:
+                links.append(f'<{link}{page + 1}>; rel="next"')
+            links.append(f'<{link}{last_page}>; rel="last"')
+            headers['Link'] = ', '.join(links)
+        return 200, repos, headers
+
+    def contents(self, org_name: str, repo_name: str, files: Dict[str, str], path: str) -> Tuple[int, object, Dict[str, str]]:
+        if path in files:
+            return 200, self.content_item(org_name, repo_name, path, files[path]), {}
+
+        prefix = f'{path}/' if path else ''
+        entries = {}
+        for file_path, content in files.items():
+            if not file_path.startswith(prefix):
+                continue
+            name, _, rest = file_path[len(prefix):].partition('/')
+            if rest:
+                entries[name] = {'name': name, 'path': prefix + name, 'type': 'dir', 'sha': blob_sha(prefix + name), 'url': f'{self.base()}/repos/{org_name}/{repo_name}/contents/{prefix}{name}', 'download_url': None}
+            else:
+                entries[name] = self.content_item(org_name, repo_name, file_path, content)
+        if not entries:
+            return 404, {'message': 'Not Found'}, {}
+        return 200, [entries[name] for name in sorted(entries)], {}
+
+    def content_item(self, org_name: str, repo_name: str, path: str, content: str) -> Dict:
+        entry = self.blob_entry(org_name, repo_name, path, content)
+        return {'name': path.rsplit('/', 1)[-1], 'path': path, 'type': 'file', 'sha': entry['sha'], 'size': entry['size'], 'url': entry['url'], 'download_url': None}
+
+    def code_search(self, query: str, page: int, per_page: int) -> Dict:
+        terms = dict(term.split(':', 1) for term in query.split() if ':' in term)
+        filename = terms.get('filename', '').lower()
+        org_name = terms.get('user', '')
+        items = []
+        for repo_name in self.fake.world.repo_names(org_name):
+            for path in self.fake.world.files(org_name, repo_name):
+                if path.rsplit('/', 1)[-1].lower() == filename:
+                    items.append({'name': filename, 'path': path, 'repository': {'name': repo_name}})
+        # paged like GitHub: at most 100 per page
+        per_page = min(per_page, 100)
+        return {'total_count': len(items), 'incomplete_results': False, 'items': items[(page - 1) * per_page:page * per_page]}
+
+    ### Answer the aliased blob query built by GraphQLBlobFetcher.execute
+    def graphql(self, body: Dict) -> Dict:
+        variables = body.get('variables') or {}
+        data = {}
+        for name in variables:
+            if not name.startswith('o'):
+                continue
+            i = name[1:]
+            path = variables[f'e{i}'].partition(':')[2]
+            files = self.fake.world.files(variables[f'o{i}'], variables[f'n{i}']) or {}
+            content = files.get(path)
+            blob = {'text': content, 'isBinary': False, 'isTruncated': False} if content is not None else None
+            data[f'f{i}'] = {'object': blob}
+        return {'data': data}
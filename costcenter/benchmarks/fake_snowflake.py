@@ -0,0 +1,116 @@
+import csv
+import gzip
+import re
+import sqlite3
+from typing import Dict, List, Optional, Sequence
+from upload2Snowflake import COLUMNS
+
+"""
+    SQLite-backed stand-in for the snowflake.connector connection used by
+    upload2Snowflake, translating the handful of Snowflake-only statements it
+    issues (temporary LIKE tables, PUT / COPY INTO a table stage, MERGE)
+    into SQLite. Staged files are read at PUT time, since the uploader
+    deletes its temp directory before the COPY.
+"""
+
+CREATE_LIKE = re.compile(r'CREATE OR REPLACE TEMPORARY TABLE (\w+) LIKE (\w+)', re.IGNORECASE)
+PUT = re.compile(r"PUT 'file://([^']+)' @%(\w+)", re.IGNORECASE)
+COPY = re.compile(r'COPY INTO (\w+) \(([^)]*)\)\s+FROM @%(\w+)', re.IGNORECASE)
+MERGE = re.compile(r'MERGE INTO (\w+) (\w+)\s+USING (\w+) (\w+)\s+ON (.*?)\s+WHEN NOT MATCHED THEN INSERT \(([^)]*)\) VALUES \(([^)]*)\)', re.IGNORECASE | re.DOTALL)
+
+
+class SQLiteConnection:
+    """Connection to a SQLite file holding GITHUB_DATA; one per upload or BatchUploader run, like the real one."""
+    def __init__(self, db_path: str):
+        # autocommit; BEGIN / commit() / rollback() manage transactions explicitly
+        self.conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS GITHUB_DATA ({', '.join(f'{column} TEXT' for column in COLUMNS)})")
+        # table -> rows PUT to its stage
+        self.stages: Dict[str, List[List[str]]] = {}
+        self.statements = 0
+
+    def cursor(self) -> 'SQLiteCursor':
+        return SQLiteCursor(self)
+
+    def commit(self):
+        if self.conn.in_transaction:
+            self.conn.execute('COMMIT')
+
+    def rollback(self):
+        if self.conn.in_transaction:
+            self.conn.execute('ROLLBACK')
+
+    def close(self):
+        self.rollback()
+        self.conn.close()
+
+
+class SQLiteCursor:
+    def __init__(self, connection: SQLiteConnection):
+        self.connection = connection
+        self.cursor = connection.conn.cursor()
+        # result of a translated statement that returns a row count in Snowflake (MERGE, COPY)
+        self.result: Optional[List[tuple]] = None
+
+    def execute(self, query: str, params: Sequence = ()):
+        self.connection.statements += 1
+        self.result = None
+        conn = self.connection.conn
+
+        match = CREATE_LIKE.search(query)
+        if match:
+            table, like = match.groups()
+            conn.execute(f'DROP TABLE IF EXISTS temp.{table}')
+            conn.execute(f'CREATE TEMP TABLE {table} AS SELECT * FROM {like} WHERE 0')
+            return self
+
+        match = PUT.search(query)
+        if match:
+            path, table = match.groups()
+            with gzip.open(path, 'rt', newline='', encoding='utf-8') as f:
+                self.connection.stages.setdefault(table, []).extend(csv.reader(f))
+            return self
+
+        match = COPY.search(query)
+        if match:
+            table, columns, stage = match.groups()
+            rows = self.connection.stages.pop(stage, [])
+            placeholders = ', '.join('?' * len(rows[0])) if rows else ''
+            if rows:
+                conn.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', rows)
+            self.result = [(len(rows),)]
+            return self
+
+        match = MERGE.search(query)
+        if match:
+            target, t, source, s, condition, columns, values = match.groups()
+            self.cursor.execute(f"""
+                INSERT INTO {target} ({columns})
+                SELECT {values} FROM {source} {s}
+                WHERE NOT EXISTS (SELECT 1 FROM {target} {t} WHERE {condition})
+            """)
+            self.result = [(self.cursor.rowcount,)]
+            return self
+
+        self.cursor.execute(query.replace('%s', '?'), tuple(params or ()))
+        return self
+
+    def executemany(self, query: str, rows: Sequence[Sequence]):
+        self.connection.statements += 1
+        self.result = None
+        self.cursor.executemany(query.replace('%s', '?'), [tuple(row) for row in rows])
+        return self
+
+    def fetchone(self):
+        if self.result is not None:
+            return self.result.pop(0) if self.result else None
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        if self.result is not None:
+            rows, self.result = self.result, []
+            return rows
+        return self.cursor.fetchall()
+
+    def close(self):
+        self.cursor.close()
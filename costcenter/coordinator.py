@@ -0,0 +1,192 @@
+import argparse
+import multiprocessing
+import queue
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from harvest_data import ScanRepo, harvest_repo
+from harvest_state import HarvestState, ShardCheckpoints
+from pipeline import bounded_map
+from upload2Snowflake import update_snowflake
+
+"""
+    Sharded, checkpointed harvest across many orgs. Orgs (and optionally each
+    org's repos) are split into shards that worker processes pull from a
+    shared queue; every process owns one GitHub token, so each token's rate
+    limit is paced by exactly one scheduler. Finished repos and shards are
+    checkpointed; re-running resumes the newest run not yet uploaded with
+    the same orgs, shard count and dry-run flag (or the given --run-id,
+    which must match them). A finished dry run is closed, never resumed.
+    To run this script, use the following command:
+        'python coordinator.py --orgs org1 org2 --tokens TOKEN1 TOKEN2 --checkpoint-db harvest.db'
+"""
+
+
+### Stable shard assignment of a repo within its org
+def shard_of(org_name: str, repo_name: str, shard_count: int) -> int:
+    return zlib.crc32(f"{org_name}/{repo_name}".encode('utf-8')) % shard_count
+
+
+### Harvest one shard: the org's repos that hash to `shard`, skipping repos already checkpointed
+def run_shard(scanner: ScanRepo, checkpoints: ShardCheckpoints, state: Optional[HarvestState], run_id: str, org_name: str, shard: int, shard_count: int, options: Dict) -> int:
+
+    done = checkpoints.done_repos(run_id, org_name)
+    repos = (
+        repo for repo in scanner.iter_repos(org_name)
+        if shard_of(org_name, repo['name'], shard_count) == shard and repo['name'] not in done
+    )
+
+    def scan(repo: Dict) -> Tuple[str, List[Dict]]:
+        records = harvest_repo(scanner, org_name, repo, use_tree=options['discovery'] == 'tree', state=state, full=options['full'])
+        return repo['name'], records
+
+    workers = max(1, options['workers'])
+    scanned = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for repo_name, records in bounded_map(executor, scan, repos, window=workers * 2):
+            checkpoints.save_repo(run_id, org_name, shard, repo_name, records)
+            scanned += 1
+
+    checkpoints.finish_shard(run_id, org_name, shard)
+    return scanned
+
+
+### Worker process: owns one token and pulls shards until it reads the None sentinel
+def shard_worker(token: str, shards: multiprocessing.Queue, results: multiprocessing.Queue, run_id: str, options: Dict):
+
+    scanner = ScanRepo(
+        token,
+        pool_size=max(1, options['workers']),
+        cache_dir=options['cache_dir'],
+        cache_size_mb=options['cache_size_mb'],
+        graphql_batch_size=options['graphql_batch_size'],
+        extract_cache=options['extract_cache']
+    )
+    checkpoints = ShardCheckpoints(options['checkpoint_db'])
+    state = HarvestState(options['state_db']) if options['state_db'] else None
+
+    try:
+        while True:
+            item = shards.get()
+            if item is None:
+                break
+            org_name, shard, shard_count = item
+            try:
+                scanned = run_shard(scanner, checkpoints, state, run_id, org_name, shard, shard_count, options)
+                results.put((org_name, shard, None))
+                print(f"Shard {org_name}#{shard}/{shard_count}: {scanned} repo(s) scanned")
+            except Exception as e:
+                # the shard stays unfinished; its completed repos are kept for the next attempt
+                results.put((org_name, shard, f"{type(e).__name__}: {e}"))
+    finally:
+        print(f"Worker {multiprocessing.current_process().name} GitHub API usage: {scanner.stats()}")
+        scanner.close()
+        checkpoints.close()
+        if state is not None:
+            state.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Sharded, resumable scan of GitHub orgs')
+    parser.add_argument('--orgs', nargs='+', required=True, help='organization/user names')
+    parser.add_argument('--tokens', nargs='+', required=True, help='GitHub tokens; one worker process per token')
+    parser.add_argument('--checkpoint-db', required=True, help='SQLite file holding per-repo and per-shard checkpoints')
+    parser.add_argument('--run-id', help='checkpoint namespace; re-use it to resume an interrupted run (default: resume the newest run not yet uploaded with the same --orgs, --repo-shards and --dry-run, else start a new one)')
+    parser.add_argument('--repo-shards', type=int, default=1, help='split each org\'s repos into this many shards')
+    parser.add_argument('--discovery', choices=['tree', 'contents'], default='tree', help='file discovery mode: one Git Trees API call per repo, or a per-directory contents walk')
+    parser.add_argument('--workers', type=int, default=4, help='repositories scanned concurrently within each process')
+    parser.add_argument('--cache-dir', help='directory for the ETag response cache (disabled if omitted)')
+    parser.add_argument('--cache-size-mb', type=int, default=512, help='maximum size of the response cache')
+    parser.add_argument('--state-db', help='SQLite file recording the last scan of each repo; enables incremental runs')
+    parser.add_argument('--full', action='store_true', help='rescan every repo even if unchanged since the last run')
+    parser.add_argument('--graphql-batch-size', type=int, default=0, help='fetch matched files through batched GraphQL queries of this many blobs (0: one REST call per file)')
+    parser.add_argument('--extract-cache', help='SQLite file caching extracted expense IDs by blob SHA (disabled if omitted)')
+    parser.add_argument('--upload-mode', choices=['bulk', 'executemany', 'row', 'sync'], default='bulk', help='Snowflake load once all shards are done')
+    parser.add_argument('--dry-run', action='store_true', help='with --upload-mode sync: report insert/update/delete counts without writing')
+
+    args = parser.parse_args(argv)
+    if args.dry_run and args.upload_mode != 'sync':
+        parser.error('--dry-run requires --upload-mode sync')
+
+    checkpoints = ShardCheckpoints(args.checkpoint_db)
+    if args.run_id is None:
+        # an interrupted run is resumed even when the rerun happens after midnight
+        args.run_id = checkpoints.latest_open_run(args.orgs, args.repo_shards, args.dry_run) or datetime.now(timezone.utc).strftime('%Y-%m-%dT%H%M%S.%fZ')
+    if checkpoints.is_uploaded(args.run_id):
+        print(f"Run {args.run_id} is already harvested and uploaded; pass a new --run-id to start over")
+        return
+    if checkpoints.is_closed(args.run_id):
+        print(f"Dry run {args.run_id} is finished and closed; pass a new --run-id to start over")
+        return
+
+    # (org, shard) checkpoints only describe the same repos under the same orgs and shard count; sync deletes are scoped to --orgs
+    started = checkpoints.start_run(args.run_id, args.orgs, args.repo_shards, args.dry_run)
+    if started != {'orgs': sorted(set(args.orgs)), 'repo_shards': args.repo_shards, 'dry_run': args.dry_run}:
+        checkpoints.close()
+        options = f"--orgs {' '.join(started['orgs'])} --repo-shards {started['repo_shards']}{' --dry-run' if started['dry_run'] else ''}"
+        parser.error(f"run {args.run_id} was started with {options}; resume it with the same options or pass a new --run-id")
+
+    # only shards without a finished checkpoint are (re)scheduled
+    finished = checkpoints.finished_shards(args.run_id)
+    pending = [
+        (org_name, shard, args.repo_shards)
+        for org_name in args.orgs
+        for shard in range(args.repo_shards)
+        if (org_name, shard) not in finished
+    ]
+    print(f"Run {args.run_id}: {len(pending)} shard(s) to scan, {len(finished)} already finished")
+
+    if pending:
+        options = vars(args)
+        shards = multiprocessing.Queue()
+        results = multiprocessing.Queue()
+        tokens = args.tokens[:len(pending)]
+        for item in pending:
+            shards.put(item)
+        # one stop sentinel per worker, queued behind the shards
+        for _ in tokens:
+            shards.put(None)
+
+        processes = [
+            multiprocessing.Process(target=shard_worker, args=(token, shards, results, args.run_id, options), name=f'shard-worker-{i}')
+            for i, token in enumerate(tokens)
+        ]
+        for process in processes:
+            process.start()
+
+        outcomes = {}
+        while len(outcomes) < len(pending):
+            try:
+                org_name, shard, error = results.get(timeout=5)
+                outcomes[(org_name, shard)] = error
+            except queue.Empty:
+                # a worker killed mid-shard never reports back
+                if not any(process.is_alive() for process in processes):
+                    break
+        for process in processes:
+            process.join()
+
+        failed = [
+            f"{org_name}#{shard}: {outcomes.get((org_name, shard)) or 'worker exited before finishing'}"
+            for org_name, shard, _ in pending
+            if outcomes.get((org_name, shard), 'missing') is not None
+        ]
+
+        if failed:
+            print(f"Failed shard(s), re-run (with --run-id {args.run_id} or none) to resume:")
+            print('\n'.join(f"  {line}" for line in failed))
+            sys.exit(1)
+
+    ### Compile, Insert/Update into Snowflake once every shard is done ###
+    update_snowflake(list(checkpoints.records(args.run_id)), mode=args.upload_mode, orgs=args.orgs, dry_run=args.dry_run)
+    if args.dry_run:
+        checkpoints.close_run(args.run_id)
+    else:
+        checkpoints.mark_uploaded(args.run_id)
+    checkpoints.close()
+
+
+if __name__ == '__main__':
+    main()
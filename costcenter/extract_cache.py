@@ -0,0 +1,55 @@
+import json
+import sqlite3
+import threading
+from typing import List, Optional
+
+
+class ExtractionCache:
+    """
+    Content-addressed SQLite cache of extracted expense IDs, keyed by the
+    git blob SHA of the file plus the extractor name and version. Forked and
+    templated repos share blobs, so a known SHA skips both the download and
+    the parse. Bump an extractor's version when its output changes.
+    """
+    def __init__(self, db_path: str):
+        self.lock = threading.Lock()
+        # timeout: the file may be shared by several harvest processes
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS extracted_ids (
+                blob_sha TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                exp_ids TEXT NOT NULL,
+                PRIMARY KEY (blob_sha, extractor, version)
+            )
+        """)
+        self.conn.commit()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, blob_sha: str, extractor: str, version: int) -> Optional[List[str]]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT exp_ids FROM extracted_ids WHERE blob_sha = ? AND extractor = ? AND version = ?",
+                (blob_sha, extractor, version)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, blob_sha: str, extractor: str, version: int, exp_ids: List[str]):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO extracted_ids (blob_sha, extractor, version, exp_ids) VALUES (?, ?, ?, ?)",
+                (blob_sha, extractor, version, json.dumps(exp_ids))
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,103 @@
+import re
+import yaml
+from typing import Callable, Dict, List, Optional, Tuple
+
+# libyaml-backed loader when PyYAML was built with it; pure-Python otherwise
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+###  Variations of exp-id keys, checked in this order at the top level  ###
+EXP_ID_KEYS = ('exp-id', 'expid', 'EXP-ID')
+# normalized once; nested keys are matched case-insensitively
+NORMALIZED_EXP_ID_KEYS = frozenset(key.lower() for key in EXP_ID_KEYS)
+
+# Cheap prefilter: a file without anything like an exp-id key can't yield one, so skip the YAML parse
+EXP_ID_KEY_PATTERN = re.compile(r'exp-?id', re.IGNORECASE)
+# RegeEx pattern - match CC or cc followed by 7 digits
+PROD_OWNER_PATTERN = re.compile(r'CC\d{7}', re.IGNORECASE)
+
+# name -> (extractor function, version); bump the version whenever an extractor's output changes
+EXTRACTORS: Dict[str, Tuple[Callable[[Optional[str]], List[str]], int]] = {}
+
+
+### Register an extractor function under a name and version
+def register_extractor(name: str, version: int):
+    def decorator(func):
+        EXTRACTORS[name] = (func, version)
+        return func
+    return decorator
+
+
+### Iterative, pre-order walk through nested dicts/lists collecting values of exp-id keys
+def search_exp_id(data) -> List[str]:
+    results = []
+    # (is_dict, iterator) pairs; dict iterators yield (key, value), list iterators the items
+    stack = [(True, iter(data.items()))] if isinstance(data, dict) else [(False, iter(data))]
+    while stack:
+        is_dict, items = stack[-1]
+        try:
+            item = next(items)
+        except StopIteration:
+            stack.pop()
+            continue
+
+        if is_dict:
+            key, value = item
+            if isinstance(key, str) and key.lower() in NORMALIZED_EXP_ID_KEYS:
+                results.append(str(value))
+        else:
+            value = item
+
+        if isinstance(value, dict):
+            stack.append((True, iter(value.items())))
+        elif isinstance(value, list):
+            stack.append((False, iter(value)))
+
+    return results
+
+
+# Search for exp-id in costcenter.yaml content
+@register_extractor('costcenter', version=2)
+def extract_expense_ids(content: Optional[str]) -> List[str]:
+
+    if not content or not EXP_ID_KEY_PATTERN.search(content):
+        return []
+    try:
+        """
+        Goes through content of costcenter.yaml file by converting its content
+        to python object to extract exp-id. ***Safe standard YAML***
+        """
+        yaml_content = yaml.load(content, Loader=SafeLoader)
+    except yaml.YAMLError:
+        return []
+
+    if not isinstance(yaml_content, dict):
+        return []
+
+    # top-level key wins, exact spelling first
+    for key in EXP_ID_KEYS:
+        if key in yaml_content:
+            return [str(yaml_content[key])]
+
+    ### search through nested sections ###
+    return search_exp_id(yaml_content)
+
+
+# Search for exp-id pattern in prod-owner.md content
+@register_extractor('prod_owner', version=1)
+def extract_prod_owner_ids(content: Optional[str]) -> List[str]:
+
+    if not content:
+        return []
+
+    # Use a dictionary to store unique exp-ids in a case-insensitive manner
+    unique_exp_ids = {}
+    for match in PROD_OWNER_PATTERN.findall(content):
+        lower_match = match.lower()
+        if lower_match not in unique_exp_ids:
+            unique_exp_ids[lower_match] = match
+
+    # Return the values of the dictionary as a list
+    return list(unique_exp_ids.values())
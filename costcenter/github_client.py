@@ -0,0 +1,226 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from typing import Dict, Optional
+from response_cache import ResponseCache
+from metrics import METRICS, endpoint_type
+
+# Transient server-side failures worth retrying
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Response headers kept alongside cached bodies
+CACHED_HEADERS = ('Content-Type', 'Link')
+
+
+class RateSchedule:
+    """Pacing state for one GitHub rate-limit resource (core, search, graphql)."""
+    def __init__(self):
+        self.pause_until = 0.0
+        self.next_slot = 0.0
+        self.interval = 0.0
+
+
+class GitHubSession:
+    """
+    Shared HTTP layer for ScanRepo: one pooled keep-alive session, retries with
+    jittered backoff, and a scheduler that paces requests from GitHub's
+    X-RateLimit-* / Retry-After headers instead of failing with a 403.
+    """
+    def __init__(self, token: str, pool_size: int = 10, max_retries: int = 5, backoff: float = 1.0, reserve: int = 50, cache: Optional[ResponseCache] = None):
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'token {token}',
+            'Accept': 'application/vnd.github.v3+json'
+        })
+        # keep one pooled connection per worker thread
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # requests kept in hand before the scheduler starts spreading calls until the reset
+        self.reserve = reserve
+        # optional ETag / Last-Modified cache for conditional requests
+        self.cache = cache
+
+        # scheduler state shared by all worker threads, one schedule per rate-limit resource
+        self.lock = threading.Lock()
+        self.schedules = {}
+
+        # counters
+        self.requests_made = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+
+    def get(self, url: str, params: Dict = None, headers: Dict = None, timeout: float = 30, resource: str = 'core') -> requests.Response:
+        return self.request('GET', url, params=params, headers=headers, timeout=timeout, resource=resource)
+
+    def post(self, url: str, json: Dict = None, headers: Dict = None, timeout: float = 60, resource: str = 'core') -> requests.Response:
+        return self.request('POST', url, json=json, headers=headers, timeout=timeout, resource=resource)
+
+    ### Request with pacing, retries and rate-limit handling; GETs go through the response cache
+    def request(self, method: str, url: str, params: Dict = None, headers: Dict = None, json: Dict = None, timeout: float = 30, resource: str = 'core') -> requests.Response:
+
+        use_cache = self.cache is not None and method == 'GET'
+        entry = self.cache.get(url, params) if use_cache else None
+        if entry:
+            headers = {**(headers or {}), **self.cache.validators(entry)}
+
+        for attempt in range(self.max_retries + 1):
+            self.wait_for_slot(resource)
+
+            try:
+                response = self.session.request(method, url, params=params, headers=headers, json=json, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retry_later(attempt, f"{type(e).__name__} for {url}")
+                continue
+            finally:
+                with self.lock:
+                    self.requests_made += 1
+
+            self.update_schedule(response, resource)
+            endpoint = endpoint_type(url)
+            METRICS.inc('harvest_github_requests_total', endpoint=endpoint)
+            METRICS.inc('harvest_github_bytes_total', len(response.content), endpoint=endpoint)
+
+            # unchanged since the cached copy; served from disk
+            if response.status_code == 304 and entry:
+                self.cache.record(hit=True)
+                METRICS.inc('harvest_github_cache_hits_total', endpoint=endpoint)
+                return self.cached_response(url, entry)
+
+            if use_cache and response.status_code == 200:
+                self.cache.record(hit=False)
+                self.cache.put(
+                    url,
+                    params,
+                    response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'),
+                    response.text,
+                    {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                )
+
+            if attempt == self.max_retries:
+                return response
+
+            if self.is_rate_limited(response):
+                delay = self.rate_limit_delay(response, attempt)
+                print(f"Rate limit hit ({resource}), pausing all workers for {delay:.0f}s")
+                self.pause(delay, resource)
+                with self.lock:
+                    self.retries += 1
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                self.retry_later(attempt, f"HTTP {response.status_code} for {url}")
+                continue
+
+            return response
+
+        return response
+
+    def schedule(self, resource: str) -> RateSchedule:
+        # caller holds self.lock
+        if resource not in self.schedules:
+            self.schedules[resource] = RateSchedule()
+        return self.schedules[resource]
+
+    ### Block the calling thread until the scheduler allows the next request
+    def wait_for_slot(self, resource: str = 'core'):
+        with self.lock:
+            schedule = self.schedule(resource)
+            now = time.monotonic()
+            start = max(now, schedule.pause_until, schedule.next_slot)
+            # hand out paced slots in order so waiting workers don't all wake up at once
+            schedule.next_slot = start + schedule.interval
+            wait = start - now
+        if wait > 0:
+            time.sleep(wait)
+            with self.lock:
+                self.throttled_seconds += wait
+            METRICS.inc('harvest_github_rate_limit_wait_seconds_total', wait, resource=resource)
+
+    ### Read X-RateLimit-* headers and spread the remaining budget until the reset
+    def update_schedule(self, response: requests.Response, resource: str = 'core'):
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+
+        remaining = int(remaining)
+        seconds_to_reset = max(0.0, float(reset) - time.time())
+        limit = int(response.headers.get('X-RateLimit-Limit') or 0)
+        # small budgets (search: 30/min) are paced over the whole window, large ones only near the end
+        reserve = min(self.reserve, limit) if limit else self.reserve
+        with self.lock:
+            schedule = self.schedule(resource)
+            if remaining == 0:
+                schedule.pause_until = max(schedule.pause_until, time.monotonic() + seconds_to_reset + 1)
+                schedule.interval = 0.0
+            elif remaining <= reserve:
+                schedule.interval = seconds_to_reset / remaining
+            else:
+                schedule.interval = 0.0
+
+    ### Rebuild a 200 response from a cache entry
+    @staticmethod
+    def cached_response(url: str, entry: Dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.encoding = 'utf-8'
+        response.headers = CaseInsensitiveDict(entry.get('headers') or {})
+        response._content = entry['body'].encode('utf-8')
+        return response
+
+    def pause(self, delay: float, resource: str = 'core'):
+        with self.lock:
+            schedule = self.schedule(resource)
+            schedule.pause_until = max(schedule.pause_until, time.monotonic() + delay)
+
+    def retry_later(self, attempt: int, reason: str):
+        # full jitter: sleep anywhere between 0 and the exponential ceiling
+        delay = random.uniform(0, self.backoff * 2 ** attempt)
+        print(f"Retrying in {delay:.1f}s after {reason}")
+        with self.lock:
+            self.retries += 1
+        time.sleep(delay)
+
+    @staticmethod
+    def is_rate_limited(response: requests.Response) -> bool:
+        if response.status_code not in (403, 429):
+            return False
+        if 'Retry-After' in response.headers or response.headers.get('X-RateLimit-Remaining') == '0':
+            return True
+        return 'rate limit' in response.text.lower()
+
+    @staticmethod
+    def rate_limit_delay(response: requests.Response, attempt: int) -> float:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            return float(retry_after)
+        reset = response.headers.get('X-RateLimit-Reset')
+        if response.headers.get('X-RateLimit-Remaining') == '0' and reset:
+            return max(1.0, float(reset) - time.time() + 1)
+        # secondary limits without a hint: back off exponentially from one minute
+        return 60.0 * 2 ** attempt
+
+    def stats(self) -> Dict[str, float]:
+        stats = {
+            'requests_made': self.requests_made,
+            'retries': self.retries,
+            'throttled_seconds': round(self.throttled_seconds, 2)
+        }
+        if self.cache:
+            stats['cache_hits'] = self.cache.hits
+            stats['cache_misses'] = self.cache.misses
+        return stats
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+from github_client import GitHubSession
+
+# Marks the end of the request stream for the dispatcher thread
+STOP = object()
+
+
+class GraphQLBlobFetcher:
+    """
+    Collects file-content requests from all scanner threads and resolves
+    them in batches with one GraphQL query per batch, using an aliased
+    repository { object(expression: "<ref>:<path>") } field per file.
+    Files the query can't return (errors, binary or truncated blobs) are
+    fetched through the REST contents API instead.
+    """
+    def __init__(self, client: GitHubSession, graphql_url: str, rest_fetch: Callable[[str], Optional[str]], batch_size: int = 50, linger: float = 0.05):
+        self.client = client
+        self.graphql_url = graphql_url
+        self.rest_fetch = rest_fetch
+        self.batch_size = batch_size
+        # how long the dispatcher waits for more requests to fill a batch
+        self.linger = linger
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+
+        # counters
+        self.queries = 0
+        self.blobs_fetched = 0
+        self.rest_fallbacks = 0
+
+        self.thread = threading.Thread(target=self.run, name='graphql-fetcher', daemon=True)
+        self.thread.start()
+
+    ### Text of each file; items carry org_name, repo_name, expression ("<ref>:<path>") and the REST url
+    def fetch_many(self, items: List[Dict]) -> List[Optional[str]]:
+
+        futures = []
+        for item in items:
+            future = Future()
+            self.pending.put((item, future))
+            futures.append(future)
+
+        contents = []
+        for item, future in zip(items, futures):
+            text = future.result()
+            if text is None:
+                with self.lock:
+                    self.rest_fallbacks += 1
+                text = self.rest_fetch(item['url'])
+            contents.append(text)
+        return contents
+
+    def run(self):
+        while True:
+            first = self.pending.get()
+            if first is STOP:
+                return
+
+            batch = [first]
+            deadline = time.monotonic() + self.linger
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.pending.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self.execute(batch)
+            if stopping:
+                return
+
+    ### One GraphQL query for the whole batch; unresolved entries fall back to REST in the caller
+    def execute(self, batch: List):
+
+        variables = {}
+        declarations = []
+        fields = []
+        for i, (item, _) in enumerate(batch):
+            variables.update({f'o{i}': item['org_name'], f'n{i}': item['repo_name'], f'e{i}': item['expression']})
+            declarations.append(f'$o{i}: String!, $n{i}: String!, $e{i}: String!')
+            fields.append(f'f{i}: repository(owner: $o{i}, name: $n{i}) {{ object(expression: $e{i}) {{ ... on Blob {{ text isBinary isTruncated }} }} }}')
+        query = f"query({', '.join(declarations)}) {{ {' '.join(fields)} }}"
+
+        data = {}
+        try:
+            response = self.client.post(self.graphql_url, json={'query': query, 'variables': variables}, resource='graphql')
+            response.raise_for_status()
+            # partial errors (e.g. one inaccessible repo) still return data for the other aliases
+            data = response.json().get('data') or {}
+            self.queries += 1
+        except Exception as e:
+            print(f"GraphQL batch of {len(batch)} failed, falling back to REST: {e}")
+
+        for i, (_, future) in enumerate(batch):
+            blob = ((data.get(f'f{i}') or {}).get('object')) or {}
+            text = blob.get('text')
+            if text is None or blob.get('isBinary') or blob.get('isTruncated'):
+                future.set_result(None)
+            else:
+                self.blobs_fetched += 1
+                future.set_result(text)
+
+    def close(self):
+        self.pending.put(STOP)
+        self.thread.join()
@@ -1,66 +1,274 @@
 import argparse
 import requests
-import re
-import yaml
 import snowflake.connector
 import os
 import base64
-from typing import List, Optional, Dict
-from upload2Snowflake import update_snowflake
+from typing import List, Optional, Dict, Set, Iterator, Tuple
+from urllib.parse import parse_qs, urlparse
+from upload2Snowflake import connect_snowflake, update_snowflake
+from github_client import GitHubSession
+from response_cache import ResponseCache
+from harvest_state import HarvestState
+from pipeline import BatchUploader, bounded_map
+from graphql_fetch import GraphQLBlobFetcher
+from extract_cache import ExtractionCache
+from extractors import EXTRACTORS, extract_expense_ids, extract_prod_owner_ids
+from metrics import METRICS
 import fnmatch
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 BASE_URL = "https://api.github.com" # (replace with)GitHub API base URL
 # MAX_REPOS = 100  # Replace with your desired maximum number of repositories
 
+# Named file pattern groups located in a single pass over each repository
+FILE_GROUPS = {
+    'costcenter': ['costcenter.yaml', 'costcenter.yml'], # variations of costcenter.yaml
+    'prod_owner': ['prod-owner.md', 'PROD-OWNER.md', 'PROD-OWNER.MD']
+}
+
 class ScanRepo:
-    def __init__(self, token: str):    
+    def __init__(self, token: str, pool_size: int = 10, cache_dir: Optional[str] = None, cache_size_mb: int = 512, graphql_batch_size: int = 0, extract_cache: Optional[str] = None):
         self.base_url = BASE_URL.rstrip('/')
-        self.headers = {
-            'Authorization': f'token {token}',
-            'Accept': 'application/vnd.github.v3+json'
-        }
+        # conditional-request cache; disabled unless a cache directory is given
+        cache = ResponseCache(cache_dir, cache_size_mb * 1024 * 1024) if cache_dir else None
+        # pooled, rate-limit-aware session shared by all worker threads
+        self.client = GitHubSession(token, pool_size=pool_size, cache=cache)
+        # cross-repo batched file fetch over GraphQL; disabled when batch size is 0
+        self.blob_fetcher = None
+        if graphql_batch_size > 0:
+            self.blob_fetcher = GraphQLBlobFetcher(self.client, f"{self.base_url}/graphql", self.get_file_content, batch_size=graphql_batch_size)
+
+        # extracted expense IDs by blob SHA; disabled unless a database file is given
+        self.extract_cache = ExtractionCache(extract_cache) if extract_cache else None
+
+    def close(self):
+        if self.blob_fetcher is not None:
+            self.blob_fetcher.close()
+        if self.extract_cache is not None:
+            self.extract_cache.close()
+        self.client.close()
+
+    def stats(self) -> Dict:
+        stats = self.client.stats()
+        if self.blob_fetcher is not None:
+            stats['graphql_queries'] = self.blob_fetcher.queries
+            stats['graphql_blobs'] = self.blob_fetcher.blobs_fetched
+            stats['graphql_rest_fallbacks'] = self.blob_fetcher.rest_fallbacks
+        if self.extract_cache is not None:
+            stats['extract_cache_hits'] = self.extract_cache.hits
+            stats['extract_cache_misses'] = self.extract_cache.misses
+        return stats
+
+    ### All GitHub requests go through the shared session
+    def get(self, url: str, params: Dict = None, headers: Dict = None, resource: str = 'core') -> requests.Response:
+        return self.client.get(url, params=params, headers=headers, resource=resource)
+
+    ### Commit SHA at the head of a branch; the sha media type keeps the response to 40 bytes
+    def get_head_sha(self, org_name: str, repo_name: str, ref: str = 'HEAD') -> Optional[str]:
+
+        url = f"{self.base_url}/repos/{org_name}/{repo_name}/commits/{ref}"
+        response = self.get(url, headers={'Accept': 'application/vnd.github.sha'})
+
+        # 404: repo/ref not found | 409: empty repository | 422: no commit for ref
+        if response.status_code in (403, 404, 409, 422):
+            return None
+
+        response.raise_for_status()
+        return response.text.strip() or None
+
+    ### Names of repos whose default branch has any of the filenames, per GitHub code search
+    def search_candidates(self, org_name: str, filenames: List[str]) -> Optional[Set[str]]:
+
+        url = f"{self.base_url}/search/code"
+        candidates = set()
+        for filename in sorted({name.lower() for name in filenames}):
+            page = 1
+            while True:
+                # user: matches repos owned by users and organizations alike, same as get_repos
+                params = {
+                    'q': f"filename:{filename} user:{org_name}",
+                    'page': page,
+                    'per_page': 100
+                }
+                response = self.get(url, params=params, resource='search')
+                if response.status_code in (403, 422):
+                    print(f"Code search unavailable for {org_name} ({response.status_code}), crawling all repos")
+                    return None
+                response.raise_for_status()
+                result = response.json()
+
+                # search stops at 1,000 results and may time out; an incomplete candidate list is unsafe
+                if result.get('incomplete_results') or result.get('total_count', 0) > 1000:
+                    print(f"Code search results incomplete for {filename} in {org_name}, crawling all repos")
+                    return None
+
+                items = result.get('items', [])
+                candidates.update(item['repository']['name'] for item in items)
+                if len(items) < params['per_page']:
+                    break
+                page += 1
+
+        return candidates
 
     def get_repos(self, org_name: str) -> List[Dict]:
         # Get non-archived repositories
-        repos = []
+        return list(self.iter_repos(org_name))
+
+    ### Lazily yield non-archived repos; pages after the first are prefetched concurrently
+    def iter_repos(self, org_name: str, page_workers: int = 4) -> Iterator[Dict]:
+
+        # url = f"{self.base_url}/orgs/{org_name}/repos"
+        url = f"{self.base_url}/users/{org_name}/repos"
+        per_page = 100
+
+        response = self.get_repo_page(url, 1, per_page)
+        yield from self.active_repos(response)
+
+        # the Link header names the last page, so the remaining pages can be requested up front
+        last = response.links.get('last', {}).get('url')
+        if last:
+            last_page = int(parse_qs(urlparse(last).query).get('page', ['1'])[0])
+            with ThreadPoolExecutor(max_workers=max(1, min(page_workers, last_page - 1))) as pool:
+                pages = [pool.submit(self.get_repo_page, url, page, per_page) for page in range(2, last_page + 1)]
+                # yielded in page order as each page arrives
+                for page in pages:
+                    yield from self.active_repos(page.result())
+            return
+
+        # no Link header: keep paging while pages come back full
         page = 1
-        while True:
-            # url = f"{self.base_url}/orgs/{org_name}/repos"
-            url = f"{self.base_url}/users/{org_name}/repos"
-            params = {
-                'page': page,
-                'per_page': 100,
-                'type': 'all'  # Get all repos
-            }
-            
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            
-            # filter through non-archived repos only
-            current_repos = [repo for repo in response.json() if not repo.get('archived', False)]
-            
-            if not current_repos:
-                break
-                
-            repos.extend(current_repos)
-            ### capacity limiter for testing purposes
-            # if len(repos) >= MAX_REPOS:
-            #     repos = repos[:MAX_REPOS]
-            #     break
-            ### capacity limiter for testing purposes 
+        while len(response.json()) == per_page:
             page += 1
-            
-        return repos
+            response = self.get_repo_page(url, page, per_page)
+            yield from self.active_repos(response)
 
-    ### Recursively search for files in repository
-    def locate_file(self, org_name: str, repo_name: str, file_patterns: List[str], path: str = '', depth: int = 0, max_depth: int = 10, exclude_folders: List[str] = None) -> List[Dict]:
-        
-        results = []  # Initialize results list
+    def get_repo_page(self, url: str, page: int, per_page: int = 100) -> requests.Response:
+        params = {
+            'page': page,
+            'per_page': per_page,
+            'type': 'all'  # Get all repos
+        }
+        with METRICS.phase('list'):
+            response = self.get(url, params=params)
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def active_repos(response: requests.Response) -> List[Dict]:
+        # filter through non-archived repos only
+        return [repo for repo in response.json() if not repo.get('archived', False)]
+
+    ### Get the full file list of a repository in one call using the Git Trees API
+    def get_tree(self, org_name: str, repo_name: str, ref: str = 'HEAD') -> Optional[List[Dict]]:
+
+        url = f"{self.base_url}/repos/{org_name}/{repo_name}/git/trees/{ref}"
+        response = self.get(url, params={'recursive': 1})
+
+        if response.status_code == 403:
+            print(f"Access forbidden for URL: {url}")
+            return []
+
+        # 404: repo/ref not found | 409: empty repository
+        if response.status_code in (404, 409):
+            return []
+
+        response.raise_for_status()
+        tree = response.json()
+
+        # Truncated listings are incomplete; caller falls back to the directory walk
+        if tree.get('truncated'):
+            return None
+
+        return [item for item in tree.get('tree', []) if item['type'] == 'blob']
+
+    ### Apply file patterns, max_depth & exclude_folders locally against the tree path list
+    def filter_tree(self, tree: List[Dict], file_patterns: List[str], max_depth: int = 10, exclude_folders: List[str] = None) -> List[Dict]:
+
+        if exclude_folders is None:
+            exclude_folders = ['.git*', 'src', 'docs']
+
+        patterns = {pattern.lower() for pattern in file_patterns}
+        matches = []
+        for item in tree:
+            *folders, filename = item['path'].split('/')
+            # same depth semantics as the directory walk: root files are depth 0
+            if len(folders) > max_depth:
+                continue
+            if filename.lower() not in patterns:
+                continue
+            if any(fnmatch.fnmatch(folder, pattern) for folder in folders for pattern in exclude_folders):
+                continue
+            matches.append(item)
+
+        return matches
+
+    ### Scan a repository once for several named groups of file patterns
+    def scan_repo(self, org_name: str, repo_name: str, pattern_groups: Dict[str, List[str]], path: str = '', max_depth: int = 10, exclude_folders: List[str] = None, use_tree: bool = True, ref: str = 'HEAD', fetch_content: bool = True) -> Dict[str, List[Dict]]:
 
         # excluding certain folder(s) from the search
         if exclude_folders is None:
             # list folder name(s); allows wildcards
-            exclude_folders = ['.git*', 'src', 'docs'] 
+            exclude_folders = ['.git*', 'src', 'docs']
+
+        # lowercased filename -> group name; a filename belongs to a single group
+        group_of = {pattern.lower(): group for group, patterns in pattern_groups.items() for pattern in patterns}
+        results = {group: [] for group in pattern_groups}
+
+        matches = None
+        # One-shot discovery from the repo root; falls through to the directory walk if truncated
+        if use_tree and path == '':
+            with METRICS.phase('crawl'):
+                tree = self.get_tree(org_name, repo_name, ref)
+            if tree is not None:
+                matches = [{
+                    'filename': item['path'].split('/')[-1],
+                    'path': item['path'],
+                    'download_url': None,  # not returned by the trees API
+                    'url': item['url'],
+                    'sha': item['sha']
+                } for item in self.filter_tree(tree, list(group_of), max_depth, exclude_folders)]
+            else:
+                print(f"Tree listing truncated for {org_name}/{repo_name}, walking directories")
+
+        if matches is None:
+            with METRICS.phase('crawl'):
+                matches = self.walk_contents(org_name, repo_name, list(group_of), path, 0, max_depth, exclude_folders)
+
+        # without fetch_content the caller gets 'url' and blob 'sha' to fetch (or skip) contents itself
+        if not fetch_content:
+            for match in matches:
+                results[group_of[match['filename'].lower()]].append(match)
+            return results
+
+        contents = self.fetch_contents(org_name, repo_name, ref, matches)
+        for match, content in zip(matches, contents):
+            results[group_of[match['filename'].lower()]].append({
+                'filename': match['filename'],
+                'path': match['path'],
+                'download_url': match['download_url'],
+                'sha': match['sha'],
+                'content': content
+            })
+
+        return results
+
+    ### Recursively search for files in repository
+    def locate_file(self, org_name: str, repo_name: str, file_patterns: List[str], path: str = '', depth: int = 0, max_depth: int = 10, exclude_folders: List[str] = None, use_tree: bool = True, ref: str = 'HEAD') -> List[Dict]:
+
+        if depth > 0:
+            use_tree = False
+        return self.scan_repo(org_name, repo_name, {'files': file_patterns}, path, max_depth - depth, exclude_folders, use_tree, ref)['files']
+
+    ### Directory-by-directory walk using the contents API; returns matched file entries
+    def walk_contents(self, org_name: str, repo_name: str, file_patterns: List[str], path: str = '', depth: int = 0, max_depth: int = 10, exclude_folders: List[str] = None) -> List[Dict]:
+
+        results = []  # Initialize results list
+
+        if exclude_folders is None:
+            exclude_folders = ['.git*', 'src', 'docs']
 
         # print(f"Displaying depth(max:{max_depth}): {depth} | Repo: {org_name} | dir-path: {path}")
         # this limits the search recursion depth of sub-directories 
@@ -68,7 +276,7 @@ class ScanRepo:
             return results
                 
         url = f"{self.base_url}/repos/{org_name}/{repo_name}/contents/{path}"
-        response = requests.get(url, headers=self.headers)
+        response = self.get(url)
         
         if response.status_code == 403:
             print(f"Access forbidden for URL: {url}")
@@ -85,27 +293,71 @@ class ScanRepo:
             contents = [contents]
 
         # 1. check files in current directory
+        patterns = {pattern.lower() for pattern in file_patterns}
         for item in contents:
-            if item['type'] == 'file' and any(item['name'].lower() == pattern.lower() for pattern in file_patterns):
+            if item['type'] == 'file' and item['name'].lower() in patterns:
                 results.append ({
                     'filename': item['name'],
                     'path': item['path'],
                     'download_url': item['download_url'],
-                    'content': self.get_file_content(item['url'])
+                    'url': item['url'],
+                    'sha': item['sha']
                 })
 
         # 2. recursively check subdirectories
         for item in contents:
             if item['type'] == 'dir' and not any(fnmatch.fnmatch(item['name'], pattern) for pattern in exclude_folders):
-                sub_results = self.locate_file(org_name, repo_name, file_patterns, item['path'], depth + 1, max_depth, exclude_folders)
+                sub_results = self.walk_contents(org_name, repo_name, file_patterns, item['path'], depth + 1, max_depth, exclude_folders)
                 results.extend(sub_results)
 
         return results
     
+    ### Expense IDs for every matched file (parallel to matches[group]); known blob SHAs skip download & parse
+    def extract_ids(self, org_name: str, repo_name: str, ref: str, matches: Dict[str, List[Dict]]) -> Dict[str, List]:
+
+        results = {group: [None] * len(files) for group, files in matches.items()}
+        pending = []
+        for group, files in matches.items():
+            _, version = EXTRACTORS[group]
+            for i, info in enumerate(files):
+                cached = None
+                if self.extract_cache is not None and info.get('sha'):
+                    cached = self.extract_cache.get(info['sha'], group, version)
+                if cached is not None:
+                    results[group][i] = cached
+                else:
+                    pending.append((group, i, info))
+
+        # download only the files whose blob hasn't been seen before
+        contents = self.fetch_contents(org_name, repo_name, ref, [info for _, _, info in pending])
+        for (group, i, info), content in zip(pending, contents):
+            extractor, version = EXTRACTORS[group]
+            with METRICS.phase('parse'):
+                exp_ids = extractor(content)
+            results[group][i] = exp_ids
+            if self.extract_cache is not None and info.get('sha'):
+                self.extract_cache.put(info['sha'], group, version, exp_ids)
+
+        return results
+
+    ### Contents of the matched files; batched through GraphQL when enabled, otherwise one REST call each
+    def fetch_contents(self, org_name: str, repo_name: str, ref: str, matches: List[Dict]) -> List[Optional[str]]:
+
+        with METRICS.phase('fetch'):
+            if self.blob_fetcher is None or not matches:
+                return [self.get_file_content(match['url']) for match in matches]
+
+            return self.blob_fetcher.fetch_many([{
+                'org_name': org_name,
+                'repo_name': repo_name,
+                'expression': f"{ref}:{match['path']}",
+                'url': match['url']
+            } for match in matches])
+
     # Get decoded content of a file
     def get_file_content(self, url: str) -> Optional[str]:
         
-        response = requests.get(url, headers=self.headers)
+        response = self.get(url)
         response.raise_for_status()
         
         content = response.json()
@@ -114,171 +366,234 @@ class ScanRepo:
         return content.get('content')
 
     # Search for costcenter.yaml file(s) that reside in any sub-dir; and extract expense-id from it
-    def get_expense_id(self, content: str) -> Optional[str]:
-        
-        if not content:
-            return []        
-        try:
-            """ 
-            Goes through content of costcenter.yaml file by converting its content
-            to python object to extract exp-id. ***Safe standard YAML***
-            """
-            yaml_content = yaml.safe_load(content)
-            expense_ids = []
-
-            if isinstance(yaml_content, dict):
-                ###  Try variations of exp-id keys  ###
-                exp_id_keys = ['exp-id', 'expid', 'EXP-ID']
-                for key in exp_id_keys:
-                    if key in yaml_content:
-                        value = yaml_content[key]
-                        return str(value)
-                
-                ### Recursive search through nested sub-directories ###
-                def search_exp_id(data):
-                    results = []
-                    if isinstance(data, dict):
-                        for key, value in data.items():
-                            if key.lower() in [k.lower() for k in exp_id_keys]:
-                                results.append(str(value))
-                            if isinstance(value, (dict, list)):
-                                results.extend(search_exp_id(value))
-                                
-                    elif isinstance(data, list):
-                        for item in data:
-                            results.extend(search_exp_id(item))
-                            
-                    return results
-            
-                expense_ids = search_exp_id(yaml_content)
-            
-            return expense_ids
-        
-        except yaml.YAMLError as e:
-            return []   
-    
+    def get_expense_id(self, content: str) -> List[str]:
+        return extract_expense_ids(content)
+
     # Search for exp-id pattern in prod-owner.md file content
-    def get_prod_owner_exp_id(self, content: str) -> Optional[str]:
-        
-        if not content:
-            return []
-            
-        try:
-            # RegeEx pattern - match CC or cc followed by 7 digits
-            pattern = r'(?i)CC\d{7}'
-            matches = re.findall(pattern, content)
-        
-            # Use a dictionary to store unique exp-ids in a case-insensitive manner
-            unique_exp_ids = {}
-            for match in matches:
-                lower_match = match.lower()
-                if lower_match not in unique_exp_ids:
-                    unique_exp_ids[lower_match] = match
-            
-            # Return the values of the dictionary as a list
-            return list(unique_exp_ids.values())
-                        
-        except Exception as e:
-            print(f"Error searching prod-owner.md content: {e}")
-            return []
+    def get_prod_owner_exp_id(self, content: str) -> List[str]:
+        return extract_prod_owner_ids(content)
+
+
+### Stable per-repo choice of the code-search verification sample
+def in_verify_sample(org_name: str, repo_name: str, fraction: float) -> bool:
+    return zlib.crc32(f"{org_name}/{repo_name}".encode('utf-8')) % 10000 < fraction * 10000
+
+
+### Record for a repo without any costcenter / prod-owner file
+def no_record(org_name: str, repo_name: str, repo_url: str) -> Dict:
+    return {
+        'org_name': org_name,
+        'repo_name': repo_name,
+        'repo_url': repo_url,
+        'exp_id': None,
+        'costcenter_path': None,
+        'prod_owner_path': None,
+        'filename': None,
+        'type': None
+    }
+
+
+### Scan a single repository and compile its Snowflake records
+def harvest_repo(scanner: ScanRepo, org_name: str, repo: Dict, use_tree: bool = True, state: Optional[HarvestState] = None, full: bool = False, candidates: Optional[Set[str]] = None, verify_sample: float = 0.0) -> List[Dict]:
+
+    repo_name = repo['name']
+    repo_url = repo['html_url']
+    ref = repo.get('default_branch') or 'HEAD'
+    pushed_at = repo.get('pushed_at')
+    commit_sha = None
+    repo_records = []
+
+    ### Code search found none of the files in this repo; record it without crawling
+    # forks are left out of the code search index, so they are always crawled
+    if candidates is not None and repo_name not in candidates and not repo.get('fork') and not in_verify_sample(org_name, repo_name, verify_sample):
+        return [no_record(org_name, repo_name, repo_url)]
+
+    ### Incremental mode: reuse the previous records of repos that haven't changed
+    if state is not None:
+        previous = None if full else state.get(org_name, repo_name)
+        # nothing pushed since the last scan; no API calls needed
+        if previous and pushed_at and previous['pushed_at'] == pushed_at:
+            print(f"\n{org_name}/{repo_name}: unchanged since last scan, reusing {len(previous['records'])} record(s)")
+            return previous['records']
+
+        # pushes to other branches change pushed_at but not the default branch head
+        commit_sha = scanner.get_head_sha(org_name, repo_name, ref)
+        if previous and commit_sha and previous['commit_sha'] == commit_sha:
+            state.touch(org_name, repo_name, pushed_at)
+            print(f"\n{org_name}/{repo_name}: default branch unchanged at {commit_sha[:7]}, reusing {len(previous['records'])} record(s)")
+            return previous['records']
+
+        # scan the exact commit that gets recorded
+        if commit_sha:
+            ref = commit_sha
+
+    # output is buffered per repo so concurrent workers don't interleave lines
+    log = [f"\nOrg. name: {org_name}", f"Repository: {repo_name}", f"URL: {repo_url}"]
+
+    # Check for costcenter & prod-owner files in a single pass over the repo
+    matches = scanner.scan_repo(
+        org_name,
+        repo_name,
+        FILE_GROUPS,
+        use_tree=use_tree,
+        ref=ref,
+        fetch_content=False
+    )
+    # get_expense_id / get_prod_owner_exp_id results per file, served from the extraction cache when possible
+    extracted = scanner.extract_ids(org_name, repo_name, ref, matches)
+    costcenter_info_list = matches['costcenter']
+
+    # Using function: get_expense_id to search for exp-id in costcenter yaml file(s)
+    for costcenter_info, expense_ids in zip(costcenter_info_list, extracted['costcenter']):
+        log.append(f"Costcenter YAML path: {costcenter_info['path']}")
+        for expense_id in expense_ids or []:
+            log.append(f"File name: {costcenter_info['filename']} | Expense ID: {expense_id}")
+            # Compile Snowflake data for costcenter.yaml
+            repo_records.append({
+                'org_name': org_name,
+                'repo_name': repo_name,
+                'repo_url': repo_url,
+                'exp_id': expense_id,
+                'costcenter_path': costcenter_info['path'],
+                'prod_owner_path': None,
+                'filename': costcenter_info['filename'],
+                'type': 'CostCenter'
+            })
+
+    # prod-owner.md files found by the same scan
+    prod_owner_info_list = matches['prod_owner']
+
+    # if prod-owner.md exists, prints it out
+    for prod_owner_info, prod_owner_exp_ids in zip(prod_owner_info_list, extracted['prod_owner']):
+        log.append(f"Product Owner MD path: {prod_owner_info['path']}")
+        for prod_owner_exp_id in prod_owner_exp_ids:
+            log.append(f"File name: {prod_owner_info['filename']} | Expense ID: {prod_owner_exp_id}")
+            # Compile Snowflake data for prod-owner.md
+            repo_records.append({
+                'org_name': org_name,
+                'repo_name': repo_name,
+                'repo_url': repo_url,
+                'exp_id': prod_owner_exp_id,
+                'costcenter_path': None,
+                'prod_owner_path': prod_owner_info['path'],
+                'filename': prod_owner_info['filename'],
+                'type': 'Product-Ownership'
+            })
+
+    ### Add unique record into Snowflake for repos without any of the other 2 records
+    if not any([costcenter_info_list, prod_owner_info_list]):
+        repo_records.append(no_record(org_name, repo_name, repo_url))
+
+    print('\n'.join(log))
+
+    if state is not None:
+        state.save(org_name, repo_name, commit_sha, pushed_at, repo_records)
+
+    return repo_records
 
 
 def main():
     parser = argparse.ArgumentParser(description='Scan GitHub repositories')
     parser.add_argument('--orgs', nargs='+', required=True, help='organization/user names')
     parser.add_argument('--token', required=True, help='GitHub token')
+    parser.add_argument('--discovery', choices=['tree', 'contents'], default='tree', help='file discovery mode: one Git Trees API call per repo, or a per-directory contents walk')
+    parser.add_argument('--workers', type=int, default=1, help='number of repositories scanned concurrently')
+    parser.add_argument('--cache-dir', help='directory for the ETag response cache (disabled if omitted)')
+    parser.add_argument('--cache-size-mb', type=int, default=512, help='maximum size of the response cache')
+    parser.add_argument('--state-db', help='SQLite file recording the last scan of each repo; enables incremental runs')
+    parser.add_argument('--full', action='store_true', help='rescan every repo even if unchanged since the last run')
+    parser.add_argument('--upload-mode', choices=['bulk', 'executemany', 'row', 'sync'], default='bulk', help='Snowflake load: staged file + MERGE, executemany + MERGE, per-record statements, or snapshot diff of the scanned orgs')
+    parser.add_argument('--dry-run', action='store_true', help='with --upload-mode sync: report insert/update/delete counts without writing')
+    parser.add_argument('--graphql-batch-size', type=int, default=0, help='fetch matched files through batched GraphQL queries of this many blobs (0: one REST call per file)')
+    parser.add_argument('--extract-cache', help='SQLite file caching extracted expense IDs by blob SHA (disabled if omitted)')
+    parser.add_argument('--code-search', action='store_true', help='crawl only repos where code search finds a costcenter / prod-owner file (forks, which search does not index, are always crawled); not with --upload-mode sync')
+    parser.add_argument('--verify-sample', type=float, default=0.02, help='with --code-search: fraction of other repos crawled anyway to catch search index lag')
+    parser.add_argument('--batch-size', type=int, default=0, help='stream records to Snowflake in batches of this size while scanning (0: upload once at the end)')
+    parser.add_argument('--flush-seconds', type=float, default=60, help='with --batch-size: also flush a partial batch after this many seconds')
+    parser.add_argument('--metrics-json', help='write a JSON summary of run metrics to this file')
+    parser.add_argument('--metrics-prom', help='write run metrics in Prometheus textfile-collector format to this file')
+    parser.add_argument('--slow-log', help='append repos slower than --slow-repo-seconds to this JSON-lines file')
+    parser.add_argument('--slow-repo-seconds', type=float, default=30, help='with --slow-log: per-repo time above which a repo is logged')
     
     args = parser.parse_args()
+    if args.dry_run and args.upload_mode != 'sync':
+        parser.error('--dry-run requires --upload-mode sync')
+    if args.batch_size > 0 and args.upload_mode == 'sync':
+        parser.error('--upload-mode sync needs the full record set and cannot be combined with --batch-size')
+    # repos code search skips (inactive, large files, index lag) would get no-record rows and lose their real ones
+    if args.code_search and args.upload_mode == 'sync':
+        parser.error('--upload-mode sync needs every repo crawled and cannot be combined with --code-search')
     
-    scanner = ScanRepo(args.token)
+    METRICS.configure_slow_log(args.slow_log, args.slow_repo_seconds)
+    scanner = ScanRepo(args.token, pool_size=max(1, args.workers), cache_dir=args.cache_dir, cache_size_mb=args.cache_size_mb, graphql_batch_size=args.graphql_batch_size, extract_cache=args.extract_cache)
+    use_tree = args.discovery == 'tree'
+    state = HarvestState(args.state_db) if args.state_db else None
     all_repo_data = []
-    
-    for org_name in args.orgs:
-        print(f"\nScanning Org/User: {org_name}")
-        repos = scanner.get_repos(org_name)
-        
-        for repo in repos:
-            repo_name = repo['name']
-            repo_url = repo['html_url']
-            
-            print(f"\nOrg. name: {org_name}")
-            print(f"Repository: {repo_name}")
-            print(f"URL: {repo_url}")
-                        
-            # Check for costcenters
-            costcenter_info_list = scanner.locate_file(
-                org_name, 
-                repo_name, 
-                ['costcenter.yaml', 'costcenter.yml'] # variations of costcenter.yaml
-            )
-            
-            # Using function: get_expense_id to search for exp-id in costcenter yaml file(s)
-            for costcenter_info in costcenter_info_list:
-                print(f"Costcenter YAML path: {costcenter_info['path']}")
-                expense_ids = scanner.get_expense_id(costcenter_info['content'])
-                if expense_ids: ### if expense_ids is not None
-                    for expense_id in expense_ids:
-                        print(f"File name: {costcenter_info['filename']} | Expense ID: {expense_id}")
-                        # Compile Snowflake data for costcenter.yaml 
-                        repo_data = {
-                            'org_name': org_name,
-                            'repo_name': repo_name,
-                            'repo_url': repo_url,
-                            'exp_id': expense_id,
-                            'costcenter_path': costcenter_info['path'],
-                            'prod_owner_path': None,
-                            'filename': costcenter_info['filename'],
-                            'type': 'CostCenter'
-                        }
-                        all_repo_data.append(repo_data)
-                else:
-                    pass  # Do nothing if expense_ids is None
-            else:
-                pass
-                       
-            # Check for prod-owner.md files
-            prod_owner_info_list = scanner.locate_file(
-                org_name,
-                repo_name,
-                ['prod-owner.md', 'PROD-OWNER.md', 'PROD-OWNER.MD']
-            )
-            
-            # if prod-owner.md exists, prints it out
-            for prod_owner_info in prod_owner_info_list:
-                print(f"Product Owner MD path: {prod_owner_info['path']}")
-                # calling function to search exp_id in prod-owner.md
-                prod_owner_exp_ids = scanner.get_prod_owner_exp_id(prod_owner_info['content'])
-                for prod_owner_exp_id in prod_owner_exp_ids:
-                    print(f"File name: {prod_owner_info['filename']} | Expense ID: {prod_owner_exp_id}")
-                    # Compile Snowflake data for prod-owner.md
-                    repo_data = {
-                        'org_name': org_name,
-                        'repo_name': repo_name,
-                        'repo_url': repo_url,
-                        'exp_id': prod_owner_exp_id,
-                        'costcenter_path': None,
-                        'prod_owner_path': prod_owner_info['path'],
-                        'filename': prod_owner_info['filename'],
-                        'type': 'Product-Ownership'
-                    }
-                    all_repo_data.append(repo_data)                            
-              
-            ### Add unique record into Snowflake for repos without any of the other 2 records
-            if not any([costcenter_info_list, prod_owner_info_list]):
-                repo_data = {
-                    'org_name': org_name,
-                    'repo_name': repo_name,
-                    'repo_url': repo_url,
-                    'exp_id': None,
-                    'costcenter_path': None,
-                    'prod_owner_path': None,
-                    'filename': None,
-                    'type': None
-                }
-            all_repo_data.append(repo_data)
+
+    # Streaming mode: records go through a bounded queue to a batched uploader as repos finish, over one Snowflake connection
+    uploader = None
+    if args.batch_size > 0:
+        uploader = BatchUploader(partial(update_snowflake, mode=args.upload_mode), args.batch_size, args.flush_seconds, connect=connect_snowflake)
+
+    workers = max(1, args.workers)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for org_name in args.orgs:
+                print(f"\nScanning Org/User: {org_name}")
+                # repos stream in page by page while the remaining pages load
+                repos = scanner.iter_repos(org_name)
+
+                # Discovery phase: only code search hits (plus a verification sample) get crawled
+                candidates = None
+                if args.code_search:
+                    candidates = scanner.search_candidates(org_name, [name for names in FILE_GROUPS.values() for name in names])
+                if candidates is not None:
+                    print(f"Code search: {len(candidates)} candidate repo(s), verifying ~{args.verify_sample:.0%} of the others")
+
+                # results are yielded in repo order regardless of completion order, keeping output deterministic
+                harvest = partial(harvest_repo, scanner, org_name, use_tree=use_tree, state=state, full=args.full, candidates=candidates, verify_sample=args.verify_sample)
+
+                # the repo comes back with its records, for the code search miss check
+                def scan(repo: Dict, org_name: str = org_name) -> Tuple[Dict, List[Dict]]:
+                    start = time.monotonic()
+                    try:
+                        return repo, harvest(repo)
+                    finally:
+                        METRICS.repo_done(org_name, repo['name'], time.monotonic() - start)
+
+                missed = 0
+                for repo, repo_records in bounded_map(executor, scan, repos, window=workers * 2):
+                    # only sampled non-candidates and forks are crawled, so typed records in other non-candidates are search misses
+                    if candidates is not None and not repo.get('fork') and repo['name'] not in candidates and any(record['type'] for record in repo_records):
+                        missed += 1
+                        print(f"Code search missed {org_name}/{repo['name']} (index lag?)")
+                    if uploader is not None:
+                        for record in repo_records:
+                            uploader.put(record)
+                    else:
+                        all_repo_data.extend(repo_records)
+                if missed:
+                    print(f"Warning: {missed} sampled repo(s) in {org_name} had files code search didn't return; consider running without --code-search")
+    finally:
+        # flush what was scanned so far even if the scan fails part-way
+        if uploader is not None:
+            uploader.close()
+
+    api_usage = scanner.stats()
+    print(f"\nGitHub API usage: {api_usage}")
+    scanner.close()
+    if state is not None:
+        state.close()
 
     ### Compile, Insert/Update into Snowflake ###
-    update_snowflake(all_repo_data)
+    if uploader is None:
+        update_snowflake(all_repo_data, mode=args.upload_mode, orgs=args.orgs, dry_run=args.dry_run)
+
+    # written last so the upload phase and Snowflake statements are included
+    if args.metrics_json:
+        METRICS.write_json(args.metrics_json, extra={'github_api_usage': api_usage})
+    if args.metrics_prom:
+        METRICS.write_prometheus(args.metrics_prom)
 
 if __name__ == '__main__':
     main()
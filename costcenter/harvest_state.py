@@ -0,0 +1,201 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+class HarvestState:
+    """
+    Local SQLite store of the last scan of each repository: the commit SHA
+    and pushed_at it was scanned at, and the Snowflake records it produced.
+    Lets harvest_data reuse results for repositories that haven't changed.
+    """
+    def __init__(self, db_path: str):
+        self.lock = threading.Lock()
+        # timeout: the file may be shared by several harvest processes
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS repo_state (
+                org_name TEXT NOT NULL,
+                repo_name TEXT NOT NULL,
+                commit_sha TEXT,
+                pushed_at TEXT,
+                scanned_at TEXT NOT NULL,
+                records TEXT NOT NULL,
+                PRIMARY KEY (org_name, repo_name)
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, org_name: str, repo_name: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT commit_sha, pushed_at, records FROM repo_state WHERE org_name = ? AND repo_name = ?",
+                (org_name, repo_name)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'commit_sha': row[0],
+            'pushed_at': row[1],
+            'records': json.loads(row[2])
+        }
+
+    def save(self, org_name: str, repo_name: str, commit_sha: Optional[str], pushed_at: Optional[str], records: List[Dict]):
+        scanned_at = datetime.now(timezone.utc).isoformat()
+        with self.lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO repo_state (org_name, repo_name, commit_sha, pushed_at, scanned_at, records)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (org_name, repo_name, commit_sha, pushed_at, scanned_at, json.dumps(records)))
+            self.conn.commit()
+
+    ### Record a new pushed_at for a repo whose default branch didn't move
+    def touch(self, org_name: str, repo_name: str, pushed_at: Optional[str]):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE repo_state SET pushed_at = ? WHERE org_name = ? AND repo_name = ?",
+                (pushed_at, org_name, repo_name)
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class ShardCheckpoints:
+    """
+    Local SQLite checkpoints for a sharded harvest run. Each worker process
+    records every finished repo of its shard and marks the shard done, so an
+    interrupted run resumes where it stopped instead of starting over.
+    """
+    def __init__(self, db_path: str):
+        self.lock = threading.Lock()
+        # several worker processes write to the same file; wait for their locks
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS shard_repos (
+                run_id TEXT NOT NULL,
+                org_name TEXT NOT NULL,
+                shard INTEGER NOT NULL,
+                repo_name TEXT NOT NULL,
+                records TEXT NOT NULL,
+                PRIMARY KEY (run_id, org_name, repo_name)
+            );
+            CREATE TABLE IF NOT EXISTS shards (
+                run_id TEXT NOT NULL,
+                org_name TEXT NOT NULL,
+                shard INTEGER NOT NULL,
+                finished_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, org_name, shard)
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                uploaded_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS run_config (
+                run_id TEXT PRIMARY KEY,
+                orgs TEXT NOT NULL,
+                repo_shards INTEGER NOT NULL,
+                dry_run INTEGER NOT NULL,
+                started_at TEXT NOT NULL,
+                closed_at TEXT
+            );
+        """)
+        self.conn.commit()
+
+    ### Register a run (first call wins) and return the orgs, shard count and dry-run flag it was started with
+    def start_run(self, run_id: str, orgs: List[str], repo_shards: int, dry_run: bool) -> Dict:
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO run_config (run_id, orgs, repo_shards, dry_run, started_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, json.dumps(sorted(set(orgs))), repo_shards, int(dry_run), datetime.now(timezone.utc).isoformat())
+            )
+            self.conn.commit()
+            row = self.conn.execute("SELECT orgs, repo_shards, dry_run FROM run_config WHERE run_id = ?", (run_id,)).fetchone()
+        return {'orgs': json.loads(row[0]), 'repo_shards': row[1], 'dry_run': bool(row[2])}
+
+    ### Most recently started run with the same orgs, shard count and dry-run flag that is neither uploaded nor closed
+    def latest_open_run(self, orgs: List[str], repo_shards: int, dry_run: bool) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("""
+                SELECT c.run_id FROM run_config c
+                LEFT JOIN runs r ON r.run_id = c.run_id
+                WHERE r.run_id IS NULL AND c.closed_at IS NULL
+                    AND c.orgs = ? AND c.repo_shards = ? AND c.dry_run = ?
+                ORDER BY c.started_at DESC
+                LIMIT 1
+            """, (json.dumps(sorted(set(orgs))), repo_shards, int(dry_run))).fetchone()
+        return row[0] if row else None
+
+    ### A finished dry run is closed, so its checkpoints are never resumed or uploaded
+    def close_run(self, run_id: str):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE run_config SET closed_at = ? WHERE run_id = ?",
+                (datetime.now(timezone.utc).isoformat(), run_id)
+            )
+            self.conn.commit()
+
+    def is_closed(self, run_id: str) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM run_config WHERE run_id = ? AND closed_at IS NOT NULL", (run_id,)).fetchone()
+        return row is not None
+
+    def done_repos(self, run_id: str, org_name: str) -> Set[str]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT repo_name FROM shard_repos WHERE run_id = ? AND org_name = ?",
+                (run_id, org_name)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def save_repo(self, run_id: str, org_name: str, shard: int, repo_name: str, records: List[Dict]):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO shard_repos (run_id, org_name, shard, repo_name, records) VALUES (?, ?, ?, ?, ?)",
+                (run_id, org_name, shard, repo_name, json.dumps(records))
+            )
+            self.conn.commit()
+
+    def finish_shard(self, run_id: str, org_name: str, shard: int):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO shards (run_id, org_name, shard, finished_at) VALUES (?, ?, ?, ?)",
+                (run_id, org_name, shard, datetime.now(timezone.utc).isoformat())
+            )
+            self.conn.commit()
+
+    def finished_shards(self, run_id: str) -> Set[Tuple[str, int]]:
+        with self.lock:
+            rows = self.conn.execute("SELECT org_name, shard FROM shards WHERE run_id = ?", (run_id,)).fetchall()
+        return {(row[0], row[1]) for row in rows}
+
+    ### All records of a run, in org / repo order
+    def records(self, run_id: str) -> Iterator[Dict]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT records FROM shard_repos WHERE run_id = ? ORDER BY org_name, repo_name",
+                (run_id,)
+            ).fetchall()
+        for row in rows:
+            yield from json.loads(row[0])
+
+    def mark_uploaded(self, run_id: str):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, uploaded_at) VALUES (?, ?)",
+                (run_id, datetime.now(timezone.utc).isoformat())
+            )
+            self.conn.commit()
+
+    def is_uploaded(self, run_id: str) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return row is not None
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Metric descriptions, used as HELP lines in the Prometheus textfile
+HELP = {
+    'harvest_github_requests_total': 'GitHub API requests by endpoint type',
+    'harvest_github_bytes_total': 'Response bytes downloaded from GitHub by endpoint type',
+    'harvest_github_cache_hits_total': 'GitHub responses served from the ETag cache (304)',
+    'harvest_github_rate_limit_wait_seconds_total': 'Time workers spent waiting on rate-limit pacing, summed over threads',
+    'harvest_phase_seconds_total': 'Time spent per harvest phase, summed over threads',
+    'harvest_repos_total': 'Repositories processed',
+    'harvest_slow_repos_total': 'Repositories slower than the slow-log threshold',
+    'harvest_snowflake_statements_total': 'Snowflake statements executed by kind',
+    'harvest_snowflake_statement_seconds_total': 'Snowflake statement latency by kind',
+    'harvest_run_seconds': 'Wall time of the harvest run'
+}
+
+
+class Metrics:
+    """
+    Process-wide, thread-safe counters for a harvest run: GitHub calls and
+    bytes per endpoint type, cache hits, rate-limit waits, per-phase time and
+    Snowflake statement counts/latency. Written out at the end of a run as a
+    JSON summary and a Prometheus textfile; repos slower than a threshold
+    are appended to an optional slow-log.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.started = time.monotonic()
+        self.slow_log_path = None
+        self.slow_threshold = None
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] += value
+
+    ### Time a block of work under a phase label (list, crawl, fetch, parse, upload)
+    @contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.inc('harvest_phase_seconds_total', time.monotonic() - start, phase=name)
+
+    def configure_slow_log(self, path: Optional[str], threshold: float):
+        self.slow_log_path = path
+        self.slow_threshold = threshold
+
+    def repo_done(self, org_name: str, repo_name: str, seconds: float):
+        self.inc('harvest_repos_total')
+        if self.slow_log_path is None or seconds < self.slow_threshold:
+            return
+        self.inc('harvest_slow_repos_total')
+        line = json.dumps({'org_name': org_name, 'repo_name': repo_name, 'seconds': round(seconds, 3)})
+        with self.lock:
+            with open(self.slow_log_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            counters = dict(self.counters)
+        counters[('harvest_run_seconds', ())] = time.monotonic() - self.started
+
+        summary = defaultdict(dict)
+        for (name, labels), value in sorted(counters.items()):
+            label = ','.join(f"{k}={v}" for k, v in labels) or 'total'
+            summary[name][label] = round(value, 3)
+        return dict(summary)
+
+    def write_json(self, path: str, extra: Dict = None):
+        summary = {'metrics': self.snapshot()}
+        if extra:
+            summary.update(extra)
+        self.write_atomic(path, json.dumps(summary, indent=2, default=str))
+
+    ### Textfile-collector format; written atomically so node_exporter never reads a partial file
+    def write_prometheus(self, path: str):
+        with self.lock:
+            counters = dict(self.counters)
+        counters[('harvest_run_seconds', ())] = time.monotonic() - self.started
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {'gauge' if name == 'harvest_run_seconds' else 'counter'}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric != name:
+                    continue
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+                # full precision: counters pass 1e6 requests / bytes quickly
+                sample = repr(float(value))
+                lines.append(f"{name}{{{label_text}}} {sample}" if label_text else f"{name} {sample}")
+        self.write_atomic(path, '\n'.join(lines) + '\n')
+
+    @staticmethod
+    def write_atomic(path: str, text: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+### Classify a GitHub API url for the per-endpoint counters
+def endpoint_type(url: str) -> str:
+    path = url.split('?', 1)[0]
+    if path.endswith('/graphql'):
+        return 'graphql'
+    if '/search/' in path:
+        return 'search'
+    if '/git/trees/' in path:
+        return 'tree'
+    if '/git/blobs/' in path:
+        return 'blob'
+    if '/contents/' in path or path.endswith('/contents'):
+        return 'contents'
+    if '/commits/' in path:
+        return 'commits'
+    if path.endswith('/repos'):
+        return 'repos'
+    return 'other'
+
+
+# Shared by all modules of a harvest run
+METRICS = Metrics()
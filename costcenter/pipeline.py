@@ -0,0 +1,102 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# Marks the end of the record stream for the uploader thread
+STOP = object()
+
+
+### Like executor.map, but only keeps `window` repos in flight so results can't pile up in memory
+def bounded_map(executor: Executor, fn: Callable, items: Iterable, window: int) -> Iterator:
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class BatchUploader:
+    """
+    Background uploader fed through a bounded queue. Records are flushed
+    every `batch_size` records or every `flush_seconds`, whichever comes
+    first, so progress is persisted while the scan is still running and
+    memory stays flat regardless of org size.
+    With `connect`, one connection is opened on the first flush, passed to
+    every flush as `conn` and closed when the uploader stops, so batches
+    don't each pay for a login.
+    """
+    def __init__(self, flush: Callable[..., None], batch_size: int = 1000, flush_seconds: float = 60.0, max_queue: int = 10000, connect: Optional[Callable] = None):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.error = None
+        self.connect = connect
+        self.connection = None
+
+        # counters
+        self.batches = 0
+        self.records_uploaded = 0
+
+        self.thread = threading.Thread(target=self.run, name='batch-uploader', daemon=True)
+        self.thread.start()
+
+    ### Blocks when the queue is full, applying back-pressure to the scanner
+    def put(self, record: Dict):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(record)
+
+    def run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    item = None
+
+                if item is STOP:
+                    self.upload(batch)
+                    return
+                if item is not None:
+                    batch.append(item)
+
+                if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                    self.upload(batch)
+                    batch = []
+                    deadline = time.monotonic() + self.flush_seconds
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+
+    def upload(self, batch: List[Dict]):
+        # after a failed flush keep draining the queue so the scanner isn't blocked forever
+        if not batch or self.error is not None:
+            return
+        try:
+            if self.connect is None:
+                self.flush(batch)
+            else:
+                if self.connection is None:
+                    self.connection = self.connect()
+                self.flush(batch, conn=self.connection)
+            self.batches += 1
+            self.records_uploaded += len(batch)
+            print(f"Uploaded batch #{self.batches}: {len(batch)} record(s), {self.records_uploaded} total")
+        except Exception as e:
+            print(f"Error uploading batch: {e}")
+            self.error = e
+
+    ### Flush whatever is left and stop the uploader; re-raises an upload failure
+    def close(self):
+        self.queue.put(STOP)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
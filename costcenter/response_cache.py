@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+
+class ResponseCache:
+    """
+    On-disk cache of GitHub API responses keyed by URL + query params.
+    Stores the body together with its ETag / Last-Modified validators so the
+    next run can send a conditional request; 304s don't count against the
+    rate limit. Least recently used entries are evicted above max_bytes.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # current size of each entry on disk, used for eviction
+        self.sizes = {}
+        for name in os.listdir(cache_dir):
+            if name.endswith('.json'):
+                self.sizes[name] = os.path.getsize(os.path.join(cache_dir, name))
+        self.total_bytes = sum(self.sizes.values())
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(url: str, params: Dict = None) -> str:
+        query = json.dumps(sorted((params or {}).items()), default=str)
+        return hashlib.sha256(f"{url}?{query}".encode('utf-8')).hexdigest() + '.json'
+
+    def get(self, url: str, params: Dict = None) -> Optional[Dict]:
+        path = os.path.join(self.cache_dir, self.key(url, params))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # refresh mtime so eviction treats the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    ### Conditional request headers for a cached URL
+    def validators(self, entry: Optional[Dict]) -> Dict[str, str]:
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url: str, params: Dict, etag: Optional[str], last_modified: Optional[str], body: str, headers: Dict[str, str] = None):
+        if not (etag or last_modified):
+            return
+
+        name = self.key(url, params)
+        data = json.dumps({
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'headers': headers or {},
+            'body': body
+        })
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        size = os.path.getsize(path)
+        with self.lock:
+            self.total_bytes += size - self.sizes.get(name, 0)
+            self.sizes[name] = size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    ### Drop least recently used entries until the cache is back under 90% of max_bytes
+    def evict(self):
+        def last_used(name):
+            try:
+                return os.path.getmtime(os.path.join(self.cache_dir, name))
+            except OSError:
+                return 0.0
+
+        target = self.max_bytes * 0.9
+        for name in sorted(self.sizes, key=last_used):
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            self.total_bytes -= self.sizes.pop(name)
+
+    def record(self, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
@@ -2,7 +2,13 @@ import os
 import boto3
 import json
 import snowflake.connector
-from typing import List, Dict
+import csv
+import gzip
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Tuple
+from metrics import METRICS
 
 # Connects to AWS Secrets Manager to retrieve Snowflake credentials
 def retrieve_secrets(secret_name, region):
@@ -22,16 +28,31 @@ def retrieve_secrets(secret_name, region):
     # setting secrets environment variables
     for key, value in secret_dict.items():
         os.environ[key] = value
+    return True
   
 
-##### Connect to Snowflake and update table records #####
-def update_snowflake(data: List[Dict]):
+# DB Table Columns, in the order rows are built by to_row()
+COLUMNS = ('GITHUB_ORG', 'GITHUB_REPO_NAME', 'REPO_URL', 'COSTCENTER_ID', 'COSTCENTER_PATH', 'PROD_OWNER_PATH', 'FILENAME', 'TYPE')
+# Session-scoped table the bulk path loads into before merging
+STAGE_TABLE = 'GITHUB_DATA_STAGE'
+# Columns identifying a record for the snapshot diff; the remaining columns are updatable
+KEY_COLUMNS = ('GITHUB_ORG', 'GITHUB_REPO_NAME', 'TYPE', 'COSTCENTER_ID', 'COSTCENTER_PATH', 'PROD_OWNER_PATH')
+VALUE_COLUMNS = tuple(column for column in COLUMNS if column not in KEY_COLUMNS)
 
-    ## Retrieve Snowflake credentials from AWS Secrets Manager
-    retrieve_secrets('/path-to/secrets', 'ap-southeast-1') 
-    
-    """Update Snowflake table with repository information."""
-    conn = snowflake.connector.connect(
+
+# Set once Secrets Manager has filled in the environment; later connections reuse it
+SECRETS_LOADED = False
+
+
+# Connects to Snowflake using credentials from AWS Secrets Manager
+def connect_snowflake():
+    global SECRETS_LOADED
+
+    ## Retrieve Snowflake credentials from AWS Secrets Manager, once per process
+    if not SECRETS_LOADED:
+        SECRETS_LOADED = bool(retrieve_secrets('/path-to/secrets', 'ap-southeast-1'))
+
+    return snowflake.connector.connect(
         user= os.getenv('USER'),
         account= f"{os.getenv('ACCOUNT')}.{os.getenv('REGION')}",
         role= os.getenv('ROLE'),
@@ -41,9 +62,76 @@ def update_snowflake(data: List[Dict]):
         password= os.getenv('PASSWD'),
         schema= os.getenv('DB_SCHEMA')
     )
+
+
+class TimedCursor:
+    """
+    Cursor wrapper counting statements and their latency by kind (the first
+    SQL keyword: SELECT, INSERT, MERGE, PUT, COPY, ...) into the run metrics.
+    Everything other than execute / executemany goes to the wrapped cursor.
+    """
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, query: str, *args, **kwargs):
+        with self.timed(query):
+            return self.cursor.execute(query, *args, **kwargs)
+
+    def executemany(self, query: str, *args, **kwargs):
+        with self.timed(query):
+            return self.cursor.executemany(query, *args, **kwargs)
+
+    @contextmanager
+    def timed(self, query: str):
+        kind = (query.split(None, 1) or ['?'])[0].upper()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            METRICS.inc('harvest_snowflake_statements_total', kind=kind)
+            METRICS.inc('harvest_snowflake_statement_seconds_total', time.monotonic() - start, kind=kind)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+# Ensure all values are of supported types | convert all to string, in COLUMNS order
+def to_row(repo_info: Dict) -> Tuple[str, ...]:
+    return (
+        str(repo_info['org_name']),
+        str(repo_info['repo_name']),
+        str(repo_info['repo_url']),
+        str(repo_info.get('exp_id') or ''),
+        str(repo_info.get('costcenter_path') or ''),
+        str(repo_info.get('prod_owner_path') or ''),
+        str(repo_info.get('filename') or ''),
+        str(repo_info.get('type') or '')
+    )
+
+
+##### Connect to Snowflake and update table records #####
+# An open `conn` (e.g. the BatchUploader's) is used and left open; otherwise one is opened and closed per call
+def update_snowflake(data: List[Dict], mode: str = 'bulk', orgs: List[str] = None, dry_run: bool = False, conn=None):
+
+    with METRICS.phase('upload'):
+        if mode == 'sync':
+            return sync_snowflake(data, orgs, dry_run)
+        if mode == 'bulk':
+            return bulk_update_snowflake(data, conn=conn)
+        if mode == 'executemany':
+            return bulk_update_snowflake(data, method='executemany', conn=conn)
+        return row_update_snowflake(data, conn=conn)
+
+
+def row_update_snowflake(data: List[Dict], conn=None):
+
+    """Update Snowflake table with repository information, one record at a time."""
+    owns_connection = conn is None
+    if owns_connection:
+        conn = connect_snowflake()
         
     try:
-        cursor = conn.cursor()
+        cursor = TimedCursor(conn.cursor())
         for repo_info in data:
             # Ensure all values are of supported types | convert all to string
             org_name = str(repo_info['org_name'])
@@ -128,7 +216,125 @@ def update_snowflake(data: List[Dict]):
                 print("Insert parameters:", params)
                 cursor.execute(query, params)
                 conn.commit()
+    finally:
+        if owns_connection:
+            conn.close()
+
+
+##### Bulk load all records into a temp table, then one MERGE in a single transaction #####
+def bulk_update_snowflake(data: List[Dict], method: str = 'stage', conn=None):
+
+    # identical records would otherwise be inserted twice by the MERGE
+    rows = list(dict.fromkeys(to_row(repo_info) for repo_info in data))
+    columns = ', '.join(COLUMNS)
+
+    owns_connection = conn is None
+    if owns_connection:
+        conn = connect_snowflake()
+    try:
+        cursor = TimedCursor(conn.cursor())
+        # replaced on every call, so a shared session starts each batch from an empty stage table
+        cursor.execute(f"CREATE OR REPLACE TEMPORARY TABLE {STAGE_TABLE} LIKE GITHUB_DATA")
+
+        if method == 'stage':
+            # write a gzipped CSV and PUT it to the temp table's stage
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                csv_path = os.path.join(tmp_dir, 'github_data.csv.gz')
+                with gzip.open(csv_path, 'wt', newline='', encoding='utf-8') as f:
+                    csv.writer(f, quoting=csv.QUOTE_ALL).writerows(rows)
+                cursor.execute(f"PUT 'file://{csv_path.replace(os.sep, '/')}' @%{STAGE_TABLE} AUTO_COMPRESS = FALSE OVERWRITE = TRUE")
+            cursor.execute(f"""
+                COPY INTO {STAGE_TABLE} ({columns})
+                FROM @%{STAGE_TABLE}
+                FILE_FORMAT = (TYPE = CSV COMPRESSION = GZIP FIELD_OPTIONALLY_ENCLOSED_BY = '"' EMPTY_FIELD_AS_NULL = FALSE)
+                PURGE = TRUE
+            """)
+        else:
+            placeholders = ', '.join(['%s'] * len(COLUMNS))
+            cursor.executemany(f"INSERT INTO {STAGE_TABLE} ({columns}) VALUES ({placeholders})", rows)
+
+        # records are matched on every column, same as the per-row SELECT
+        match = ' AND '.join(f"t.{column} = s.{column}" for column in COLUMNS)
+        values = ', '.join(f"s.{column}" for column in COLUMNS)
+        cursor.execute("BEGIN")
+        cursor.execute(f"""
+            MERGE INTO GITHUB_DATA t
+            USING {STAGE_TABLE} s
+            ON {match}
+            WHEN NOT MATCHED THEN INSERT ({columns}) VALUES ({values})
+        """)
+        inserted = cursor.fetchone()[0]
+        conn.commit()
+        print(f"Bulk load: {len(rows)} record(s) staged, {inserted} inserted into GITHUB_DATA")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if owns_connection:
+            conn.close()
+
+
+# Split a row tuple (COLUMNS order) into its natural key and updatable values
+def split_row(row: Tuple[str, ...]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    named = dict(zip(COLUMNS, row))
+    return tuple(named[c] for c in KEY_COLUMNS), tuple(named[c] for c in VALUE_COLUMNS)
+
+
+### Compare the current table snapshot with the harvested rows, keyed on the natural key
+def diff_rows(current_rows: List[Tuple[str, ...]], new_rows: List[Tuple[str, ...]]) -> Dict[str, List[Tuple]]:
+
+    current = dict(split_row(row) for row in current_rows)
+    new = dict(split_row(row) for row in new_rows)
+
+    inserts = [key + values for key, values in new.items() if key not in current]
+    # UPDATE parameters: new values first, then the key for the WHERE clause
+    updates = [values + key for key, values in new.items() if key in current and current[key] != values]
+    deletes = [key for key in current if key not in new]
+
+    return {'inserts': inserts, 'updates': updates, 'deletes': deletes}
+
+
+##### Snapshot the scanned orgs' rows in one query and write only the delta #####
+def sync_snowflake(data: List[Dict], orgs: List[str] = None, dry_run: bool = False) -> Dict[str, List[Tuple]]:
+
+    new_rows = [to_row(repo_info) for repo_info in data]
+    # only rows of the orgs scanned in this run are candidates for deletion
+    if not orgs:
+        orgs = sorted({row[0] for row in new_rows})
+    if not orgs:
+        print("Sync: nothing to compare")
+        return {'inserts': [], 'updates': [], 'deletes': []}
+
+    conn = connect_snowflake()
+    try:
+        cursor = TimedCursor(conn.cursor())
+        # NULLs compare as empty strings, matching to_row()
+        select_columns = ', '.join(f"COALESCE({column}, '')" for column in COLUMNS)
+        org_placeholders = ', '.join(['%s'] * len(orgs))
+        cursor.execute(f"SELECT {select_columns} FROM GITHUB_DATA WHERE GITHUB_ORG IN ({org_placeholders})", tuple(orgs))
+        current_rows = [tuple(row) for row in cursor.fetchall()]
+
+        diff = diff_rows(current_rows, new_rows)
+        print(f"Sync: {len(current_rows)} current row(s) | {len(diff['inserts'])} insert(s), {len(diff['updates'])} update(s), {len(diff['deletes'])} delete(s)")
+
+        if dry_run or not any(diff.values()):
+            return diff
+
+        key_match = ' AND '.join(f"COALESCE({column}, '') = %s" for column in KEY_COLUMNS)
+        cursor.execute("BEGIN")
+        if diff['deletes']:
+            cursor.executemany(f"DELETE FROM GITHUB_DATA WHERE {key_match}", diff['deletes'])
+        if diff['updates']:
+            assignments = ', '.join(f"{column} = %s" for column in VALUE_COLUMNS)
+            cursor.executemany(f"UPDATE GITHUB_DATA SET {assignments} WHERE {key_match}", diff['updates'])
+        if diff['inserts']:
+            insert_columns = ', '.join(KEY_COLUMNS + VALUE_COLUMNS)
+            placeholders = ', '.join(['%s'] * len(COLUMNS))
+            cursor.executemany(f"INSERT INTO GITHUB_DATA ({insert_columns}) VALUES ({placeholders})", diff['inserts'])
+        conn.commit()
+        return diff
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
-    
-    pass